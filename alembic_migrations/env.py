@@ -5,6 +5,7 @@ from sqlalchemy import engine_from_config, pool
 
 from shared.config import settings
 from shared.models import Base
+from shared.models.partitions import DEFAULT_PARTITION, PARTITION_PREFIX
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -19,6 +20,24 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+# Indexes created by migrations only when an optional extension is available; they are
+# not part of the models, so autogenerate must not propose dropping them
+OPTIONAL_INDEXES = {"ix_log_entries_message_trgm"}
+
+
+def is_partition(table_name: str) -> bool:
+    return table_name == DEFAULT_PARTITION or table_name.startswith(PARTITION_PREFIX)
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """Leave the log_entries partitions, managed at runtime, and optional indexes out of autogenerate."""
+    if type_ == "table":
+        return not is_partition(name)
+    if type_ == "index":
+        return name not in OPTIONAL_INDEXES and not is_partition(object.table.name)
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,6 +66,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -69,7 +89,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
         with context.begin_transaction():
             context.run_migrations()
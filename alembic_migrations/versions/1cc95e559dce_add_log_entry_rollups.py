@@ -0,0 +1,36 @@
+"""add log entry rollups
+
+Revision ID: 1cc95e559dce
+Revises: e3a8c6d05f27
+Create Date: 2026-10-18 15:21:36.804512
+
+Adds the per-level, per-minute counts of log entries maintained by the worker and read
+by GET /logs/stats. Entries stored before this revision are counted by running
+`python -m worker.maintenance backfill-rollups` once the worker has been deployed.
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "1cc95e559dce"
+down_revision: Union[str, None] = "e3a8c6d05f27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "log_entry_rollups",
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("level", sa.SmallInteger(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("bucket", "level"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("log_entry_rollups")
@@ -0,0 +1,60 @@
+"""add log entry attributes
+
+Revision ID: 4f9a2c7e1b83
+Revises: 1cc95e559dce
+Create Date: 2026-10-18 18:04:12.517306
+
+Adds the optional structured attributes of log entries as a JSONB column, with a GIN
+index using the jsonb_path_ops operator class to serve the attr.<key>=<value> filters of
+GET /logs. Adding a nullable column without a default does not rewrite the partitions.
+
+CREATE INDEX CONCURRENTLY is not supported on a partitioned table, so the index is
+created on the parent only, which leaves it invalid and scans nothing, then built
+concurrently on each partition and attached to it; it becomes valid once every partition
+is attached. Partitions created afterwards get their index when they are created.
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+from shared.models.partitions import PARENT_TABLE
+
+# revision identifiers, used by Alembic.
+revision: str = "4f9a2c7e1b83"
+down_revision: Union[str, None] = "1cc95e559dce"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEX_NAME = "ix_log_entries_attributes"
+
+LIST_PARTITIONS = sa.text(
+    "SELECT child.relname FROM pg_inherits JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+    "WHERE pg_inherits.inhparent = CAST(:parent AS regclass) ORDER BY child.relname"
+)
+
+
+def upgrade() -> None:
+    op.add_column("log_entries", sa.Column("attributes", postgresql.JSONB(), nullable=True))
+    op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON ONLY {PARENT_TABLE} USING gin (attributes jsonb_path_ops)")
+    partitions = op.get_bind().execute(LIST_PARTITIONS, {"parent": PARENT_TABLE}).scalars().all()
+
+    # Build the partition indexes without blocking the worker inserts
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            partition_index = f"{partition}_attributes_idx"
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} "
+                f"ON {partition} USING gin (attributes jsonb_path_ops)"
+            )
+            op.execute(f"ALTER INDEX {INDEX_NAME} ATTACH PARTITION {partition_index}")
+
+
+def downgrade() -> None:
+    # Drops the partition indexes attached to it as well
+    op.drop_index(INDEX_NAME, table_name="log_entries")
+    op.drop_column("log_entries", "attributes")
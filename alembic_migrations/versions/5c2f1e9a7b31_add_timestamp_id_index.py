@@ -0,0 +1,40 @@
+"""add timestamp id index
+
+Revision ID: 5c2f1e9a7b31
+Revises: 1731d5d1bef7
+Create Date: 2026-10-18 10:52:12.418305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c2f1e9a7b31"
+down_revision: Union[str, None] = "1731d5d1bef7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Build the index without blocking the worker inserts on a large table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_log_entries_timestamp_id",
+            "log_entries",
+            ["timestamp", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_log_entries_timestamp_id",
+            table_name="log_entries",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,109 @@
+"""partition log_entries by timestamp
+
+Revision ID: 8d4b7e2c1f06
+Revises: 5c2f1e9a7b31
+Create Date: 2026-10-18 11:20:41.093512
+
+Converts log_entries into a table range partitioned on timestamp. The existing rows are
+copied into partitions covering the retention period; older rows land in the DEFAULT
+partition. The unique index on event_id becomes a unique constraint on
+(event_id, timestamp), see shared.models.partitions for why that keeps event IDs unique.
+
+"""
+
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+
+from shared.config import settings
+from shared.models.partitions import create_default_partition, create_partitions
+
+# revision identifiers, used by Alembic.
+revision: str = "8d4b7e2c1f06"
+down_revision: Union[str, None] = "5c2f1e9a7b31"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_log_entries_id": ["id"],
+    "ix_log_entries_level": ["level"],
+    "ix_log_entries_message": ["message"],
+    "ix_log_entries_timestamp_id": ["timestamp", "id"],
+}
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE log_entries RENAME TO log_entries_legacy")
+    op.execute("ALTER TABLE log_entries_legacy RENAME CONSTRAINT log_entries_pkey TO log_entries_legacy_pkey")
+    for index_name in [*INDEXES, "ix_log_entries_event_id"]:
+        op.execute(f"DROP INDEX IF EXISTS {index_name}")
+    # Keep the id sequence alive when the legacy table is dropped
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE log_entries (
+            id INTEGER NOT NULL DEFAULT nextval('log_entries_id_seq'),
+            event_id VARCHAR,
+            message VARCHAR,
+            level VARCHAR,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT log_entries_pkey PRIMARY KEY (id, timestamp),
+            CONSTRAINT uq_log_entries_event_id_timestamp UNIQUE (event_id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY log_entries.id")
+    for index_name, columns in INDEXES.items():
+        op.create_index(index_name, "log_entries", columns, unique=False)
+
+    connection = op.get_bind()
+    today = datetime.utcnow().date()
+    create_default_partition(connection)
+    create_partitions(
+        connection,
+        today - timedelta(days=settings.LOG_RETENTION_DAYS),
+        today + timedelta(days=settings.LOG_PARTITIONS_AHEAD),
+    )
+
+    op.execute(
+        """
+        INSERT INTO log_entries (id, event_id, message, level, timestamp)
+        SELECT id, event_id, message, level, COALESCE(timestamp, now() AT TIME ZONE 'utc')
+        FROM log_entries_legacy
+        """
+    )
+    op.execute("DROP TABLE log_entries_legacy")
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE log_entries_unpartitioned (
+            id INTEGER NOT NULL DEFAULT nextval('log_entries_id_seq'),
+            event_id VARCHAR,
+            message VARCHAR,
+            level VARCHAR,
+            timestamp TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT log_entries_unpartitioned_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO log_entries_unpartitioned (id, event_id, message, level, timestamp)
+        SELECT DISTINCT ON (event_id) id, event_id, message, level, timestamp
+        FROM log_entries
+        ORDER BY event_id, timestamp
+        """
+    )
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE log_entries CASCADE")
+
+    op.execute("ALTER TABLE log_entries_unpartitioned RENAME TO log_entries")
+    op.execute("ALTER TABLE log_entries RENAME CONSTRAINT log_entries_unpartitioned_pkey TO log_entries_pkey")
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY log_entries.id")
+    for index_name, columns in INDEXES.items():
+        op.create_index(index_name, "log_entries", columns, unique=False)
+    op.create_index("ix_log_entries_event_id", "log_entries", ["event_id"], unique=True)
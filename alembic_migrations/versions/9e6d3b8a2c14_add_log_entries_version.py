@@ -0,0 +1,36 @@
+"""add log entries version
+
+Revision ID: 9e6d3b8a2c14
+Revises: 4f9a2c7e1b83
+Create Date: 2026-10-18 20:12:47.903215
+
+Adds the single-row counter the worker bumps in every transaction that stores log
+entries, from which GET /logs derives its ETag.
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9e6d3b8a2c14"
+down_revision: Union[str, None] = "4f9a2c7e1b83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "log_entries_version",
+        sa.Column("id", sa.SmallInteger(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.CheckConstraint("id = 1", name="ck_log_entries_version_single_row"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO log_entries_version (id, version) VALUES (1, 1)")
+
+
+def downgrade() -> None:
+    op.drop_table("log_entries_version")
@@ -0,0 +1,51 @@
+"""add message search vector
+
+Revision ID: b71e3a5d9c42
+Revises: 8d4b7e2c1f06
+Create Date: 2026-10-18 11:58:07.265140
+
+Replaces the B-tree index on log_entries.message, which cannot serve "contains" queries
+and rejects messages larger than a B-tree row, with a generated tsvector column and a
+GIN index. A trigram index for substring search is added when pg_trgm is available.
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b71e3a5d9c42"
+down_revision: Union[str, None] = "8d4b7e2c1f06"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_log_entries_message", table_name="log_entries")
+    op.execute(
+        "ALTER TABLE log_entries ADD COLUMN message_tsv tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(message, ''))) STORED"
+    )
+    op.create_index("ix_log_entries_message_tsv", "log_entries", ["message_tsv"], postgresql_using="gin")
+
+    pg_trgm_available = op.get_bind().execute(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')")
+    )
+    if pg_trgm_available.scalar():
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_log_entries_message_trgm",
+            "log_entries",
+            ["message"],
+            postgresql_using="gin",
+            postgresql_ops={"message": "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_log_entries_message_trgm", table_name="log_entries", if_exists=True)
+    op.drop_index("ix_log_entries_message_tsv", table_name="log_entries")
+    op.drop_column("log_entries", "message_tsv")
+    op.create_index("ix_log_entries_message", "log_entries", ["message"], unique=False)
@@ -0,0 +1,115 @@
+"""compact log_entries storage
+
+Revision ID: e3a8c6d05f27
+Revises: b71e3a5d9c42
+Create Date: 2026-10-18 13:04:52.418337
+
+Stores level as a SMALLINT holding the numeric logging level and timestamp as a
+TIMESTAMPTZ defaulting to now(), drops the B-tree indexes on id and level that no query
+uses, and indexes timestamp with BRIN next to the (timestamp, id) B-tree used for keyset
+pagination. Postgres cannot change the type of a partition key, so the table is rebuilt:
+the rows are copied aside, the partitioned table is recreated with the same partition
+bounds, read as UTC, and the rows are copied back.
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e3a8c6d05f27"
+down_revision: Union[str, None] = "b71e3a5d9c42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+LEGACY_INDEXES = {
+    "ix_log_entries_id": ["id"],
+    "ix_log_entries_level": ["level"],
+}
+
+
+def level_to_number(column: str) -> str:
+    cases = " ".join(f"WHEN '{name}' THEN {value}" for name, value in LOG_LEVELS.items())
+    return f"CASE {column} {cases} END"
+
+
+def level_to_name(column: str) -> str:
+    cases = " ".join(f"WHEN {value} THEN '{name}'" for name, value in LOG_LEVELS.items())
+    return f"CASE {column} {cases} END"
+
+
+def rebuild_log_entries(level_type: str, timestamp_type: str, level_expression: str) -> None:
+    """Recreate log_entries with the given column types, keeping its rows and partitions."""
+    connection = op.get_bind()
+    # Partition bounds are written and read back in UTC
+    op.execute("SET LOCAL TimeZone = 'UTC'")
+    partitions = connection.execute(
+        sa.text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+            "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+            "WHERE parent.relname = 'log_entries'"
+        )
+    ).all()
+    pg_trgm_installed = connection.execute(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+    ).scalar()
+
+    op.execute(
+        "CREATE UNLOGGED TABLE log_entries_rebuild AS SELECT id, event_id, message, level, timestamp FROM log_entries"
+    )
+    # Keep the id sequence alive when the table is dropped
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE log_entries")
+
+    op.execute(
+        f"""
+        CREATE TABLE log_entries (
+            id INTEGER NOT NULL DEFAULT nextval('log_entries_id_seq'),
+            event_id VARCHAR,
+            message VARCHAR,
+            level {level_type},
+            timestamp {timestamp_type} NOT NULL,
+            message_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', coalesce(message, ''))) STORED,
+            CONSTRAINT log_entries_pkey PRIMARY KEY (id, timestamp),
+            CONSTRAINT uq_log_entries_event_id_timestamp UNIQUE (event_id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY log_entries.id")
+    op.create_index("ix_log_entries_timestamp_id", "log_entries", ["timestamp", "id"], unique=False)
+    op.create_index("ix_log_entries_message_tsv", "log_entries", ["message_tsv"], postgresql_using="gin")
+    if pg_trgm_installed:
+        op.create_index(
+            "ix_log_entries_message_trgm",
+            "log_entries",
+            ["message"],
+            postgresql_using="gin",
+            postgresql_ops={"message": "gin_trgm_ops"},
+        )
+    for name, bound in partitions:
+        op.execute(f"CREATE TABLE {name} PARTITION OF log_entries {bound}")
+
+    op.execute(
+        f"""
+        INSERT INTO log_entries (id, event_id, message, level, timestamp)
+        SELECT id, event_id, message, {level_expression}, timestamp AT TIME ZONE 'UTC'
+        FROM log_entries_rebuild
+        """
+    )
+    op.execute("DROP TABLE log_entries_rebuild")
+
+
+def upgrade() -> None:
+    rebuild_log_entries("SMALLINT", "TIMESTAMP WITH TIME ZONE DEFAULT now()", level_to_number("level"))
+    op.create_index("ix_log_entries_timestamp_brin", "log_entries", ["timestamp"], postgresql_using="brin")
+
+
+def downgrade() -> None:
+    rebuild_log_entries("VARCHAR", "TIMESTAMP WITHOUT TIME ZONE", level_to_name("level"))
+    for index_name, columns in LEGACY_INDEXES.items():
+        op.create_index(index_name, "log_entries", columns, unique=False)
@@ -0,0 +1,59 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class ResponseCache:
+    """
+    Bounded in-process cache of serialized responses that expire after `ttl` seconds.
+
+    The least recently used entry is evicted once `max_size` entries are stored. A
+    `max_size` of 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 2.0, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return the value stored for `key`, or None when it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def make_etag(*parts: Any) -> str:
+    """Return a strong ETag identifying `parts`, identical across processes."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return whether an If-None-Match header value matches `etag`."""
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
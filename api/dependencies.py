@@ -0,0 +1,18 @@
+from typing import AsyncGenerator
+
+from fastapi import Request
+
+
+async def get_async_db(request: Request = None) -> AsyncGenerator:  # pyright: ignore
+    """
+    Async version of get_db
+
+    The session module, and with it SQLAlchemy, is imported by the first request that
+    needs a database session rather than when the API starts.
+    """
+    from shared.models.session import AsyncSessionLocal, acquire_connection
+
+    async with AsyncSessionLocal() as session:
+        await acquire_connection(session)
+        yield session
+        await session.commit()
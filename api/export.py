@@ -0,0 +1,60 @@
+import csv
+import io
+from typing import AsyncIterator
+
+from sqlalchemy import Select, select
+
+from api.params import ExportFormat, LogFilters
+from api.queries import apply_log_filters, serialize_log_entry
+from shared.codec import codec
+from shared.metrics import metrics
+from shared.models.log_entry import LogEntry
+from shared.models.session import AsyncSessionLocal, acquire_connection
+
+EXPORT_MEDIA_TYPES: dict[str, str] = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+EXPORT_COLUMNS = ("id", "event_id", "message", "level", "timestamp", "attributes")
+
+# Rows fetched per round trip from the server-side cursor, and written per response chunk
+EXPORT_CHUNK_SIZE = 1000
+
+
+def export_query(filters: LogFilters, limit: int | None = None) -> Select:
+    """Select the exported columns of the matching log entries, oldest first."""
+    query = select(*(getattr(LogEntry, column) for column in EXPORT_COLUMNS))
+    query = apply_log_filters(query, filters).order_by(LogEntry.timestamp, LogEntry.id)
+    return query.limit(limit) if limit is not None else query
+
+
+def format_rows(rows: list, export_format: ExportFormat) -> str:
+    """Render a chunk of rows as NDJSON lines or CSV records."""
+    if export_format == "ndjson":
+        return "".join(codec.dumps(serialize_log_entry(row)) + "\n" for row in rows)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        record = serialize_log_entry(row)
+        # Attributes are written as a JSON object, left empty when there are none
+        record["attributes"] = codec.dumps(record["attributes"]) if record["attributes"] else None
+        writer.writerow(record.values())
+    return buffer.getvalue()
+
+
+async def stream_log_entries(query: Select, export_format: ExportFormat) -> AsyncIterator[str]:
+    """
+    Yield the rows of `query` in chunks of EXPORT_CHUNK_SIZE rows.
+
+    The rows are read through a server-side cursor, so only one chunk is held in memory
+    whatever the number of rows. The generator opens its own session, because the
+    request's dependencies are torn down before a streaming response body is sent.
+    """
+    if export_format == "csv":
+        yield ",".join(EXPORT_COLUMNS) + "\r\n"
+
+    async with AsyncSessionLocal() as session:
+        await acquire_connection(session)
+        result = await session.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        async for rows in result.partitions():
+            metrics.incr("api.export_rows", len(rows))
+            yield format_rows(rows, export_format)
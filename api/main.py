@@ -1,29 +1,45 @@
+import asyncio
 import logging
+import math
 from http import HTTPStatus
-from typing import Literal
+from itertools import accumulate
+from typing import TYPE_CHECKING, Annotated, Any, Literal
 
-from botocore.exceptions import ClientError
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from botocore.exceptions import BotoCoreError, ClientError
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from mangum import Mangum
-from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import Field
 from starlette.middleware.cors import CORSMiddleware
 
+from api.cache import ResponseCache, etag_matches, make_etag
+from api.dependencies import get_async_db
+from api.params import MAX_PAGE_SIZE, ExportFormat, LogFilters, StatsInterval, log_filters
+from api.sqs_batcher import SQSMessageBatcher
 from api.sqs_client import sqs
+from api.sqs_resilience import CircuitOpenError, send_deadline
+from shared.codec import codec, encode_log_entry
 from shared.config import settings
-from shared.models.database_dependency import get_async_db
-from shared.models.log_entry import LogEntry
-
-logging.basicConfig(level=logging.DEBUG)
+from shared.envelope import encode_envelope, pack_envelopes
+from shared.metrics import PROMETHEUS_CONTENT_TYPE, emit_emf, metrics, running_in_lambda
+from shared.schemas import LogEntrySchema
+from shared.utils import batched
 
+# The endpoints reading log entries import SQLAlchemy and the query modules when they are
+# first called, so that cold starts serving the ingestion endpoints do not load them
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
-class LogEntrySchema(BaseModel):
-    """Schema for log entry payload."""
+logging.basicConfig(level=logging.DEBUG)
 
-    message: str
-    level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+# SQS accepts at most 10 messages per SendMessageBatch call
+SQS_MAX_BATCH_SIZE = 10
+# Upper bound for the number of entries accepted by a single batch request
+MAX_BATCH_ENTRIES = 500
+# Time left to answer the request once the last SQS send attempt is over
+LAMBDA_RESPONSE_MARGIN_SECONDS = 0.5
 
 
 class SQSClientError(HTTPException):
@@ -33,6 +49,18 @@ class SQSClientError(HTTPException):
         super().__init__(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=message)
 
 
+class SQSUnavailableError(SQSClientError):
+    """Raised while the circuit breaker fails SQS sends fast, telling clients when to retry."""
+
+    def __init__(self, retry_after: float):
+        HTTPException.__init__(
+            self,
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail="SQS is unavailable, retry later",
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+        )
+
+
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -40,48 +68,316 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "HEAD", "PUT", "DELETE", "PATCH", "OPTIONS", "*"],
     allow_headers=["Authorization", "*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+
+sqs_batcher = SQSMessageBatcher(
+    sqs,
+    max_batch_size=min(settings.SQS_COALESCE_MAX_BATCH_SIZE, SQS_MAX_BATCH_SIZE),
+    linger=settings.SQS_COALESCE_LINGER_MS / 1000,
+    max_pending=settings.SQS_COALESCE_MAX_PENDING,
 )
 
+logs_cache = ResponseCache(max_size=settings.LOGS_CACHE_MAX_ENTRIES, ttl=settings.LOGS_CACHE_TTL_SECONDS)
+
+
+if metrics.enabled:
+
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        """Time every request, including body validation, and count the rejected ones."""
+        with metrics.timer("api.request_ms"):
+            response = await call_next(request)
+        if response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY:
+            metrics.incr("api.requests_invalid")
+        return response
+
 
 @app.exception_handler(SQSClientError)
 async def handle_sqs_client_error(request: Request, exc: SQSClientError) -> JSONResponse:
     """Exception handler for SQSClientError."""
     logging.error(f"SQSClientError: {exc.detail}")
     return JSONResponse(
-        status_code=exc.status_code, content={"message": f"Error occurred while sending message to SQS: {exc.detail}"}
+        status_code=exc.status_code,
+        content={"message": f"Error occurred while sending message to SQS: {exc.detail}"},
+        headers=exc.headers,
     )
 
 
+@app.exception_handler(RequestValidationError)
+async def handle_validation_error(request: Request, exc: RequestValidationError) -> JSONResponse:
+    """Answer 422 like FastAPI does, leaving out rejected NaN and infinite inputs, which JSON cannot represent."""
+    errors = [
+        {key: value for key, value in error.items() if key != "input" or not _is_non_finite(value)}
+        for error in exc.errors()
+    ]
+    return await request_validation_exception_handler(request, RequestValidationError(errors, body=exc.body))
+
+
+def _is_non_finite(value: Any) -> bool:
+    return isinstance(value, float) and not math.isfinite(value)
+
+
 @app.post("/logs")
 async def logs(log_entry_schema: LogEntrySchema) -> dict[str, str]:
     """ "Endpoint to handle log entries."""
-    message = log_entry_schema.json()
+    message = encode_log_entry(log_entry_schema)
     logging.debug(f"Received log entry: {message}")
     try:
-        sqs.send_message(QueueUrl=settings.QUEUE_URL, MessageBody=message)
-    except ClientError as exc:
+        with metrics.timer("api.enqueue_ms"):
+            if settings.SQS_COALESCE_ENABLED:
+                await sqs_batcher.send(message)
+            else:
+                await sqs.send_message(QueueUrl=settings.QUEUE_URL, MessageBody=message)
+    except CircuitOpenError as exc:
+        metrics.incr("api.entries_failed")
+        raise SQSUnavailableError(exc.retry_after)
+    except (ClientError, BotoCoreError) as exc:
+        metrics.incr("api.entries_failed")
         raise SQSClientError(str(exc))
 
+    metrics.incr("api.entries_accepted")
     return {"message": "Log entry queued for processing"}
 
 
+async def send_log_entries_batch(bodies: list[str], offset: int) -> list[dict[str, Any]]:
+    """
+    Send up to SQS_MAX_BATCH_SIZE log entry bodies with a single SendMessageBatch call.
+
+    Returns one result per entry, keyed by the entry position in the request payload.
+    """
+    batch_entries = [{"Id": str(offset + index), "MessageBody": body} for index, body in enumerate(bodies)]
+    try:
+        with metrics.timer("api.enqueue_ms"):
+            response = await sqs.send_message_batch(QueueUrl=settings.QUEUE_URL, Entries=batch_entries)
+    except (ClientError, BotoCoreError) as exc:
+        logging.error(f"SendMessageBatch failed: {exc}")
+        return [{"index": int(entry["Id"]), "status": "failed", "error": str(exc)} for entry in batch_entries]
+
+    results = [{"index": int(item["Id"]), "status": "queued"} for item in response.get("Successful", [])]
+    results.extend(
+        {"index": int(item["Id"]), "status": "failed", "error": item.get("Message", item.get("Code", ""))}
+        for item in response.get("Failed", [])
+    )
+    return results
+
+
+async def send_log_entries_envelope(bodies: list[str], offset: int) -> list[dict[str, Any]]:
+    """
+    Send log entry bodies packed into a single envelope message.
+
+    All entries of an envelope share the outcome of its SendMessage call.
+    """
+    indexes = range(offset, offset + len(bodies))
+    try:
+        with metrics.timer("api.enqueue_ms"):
+            await sqs.send_message(QueueUrl=settings.QUEUE_URL, MessageBody=encode_envelope(bodies))
+    except (ClientError, BotoCoreError) as exc:
+        logging.error(f"SendMessage failed for envelope of {len(bodies)} entries: {exc}")
+        return [{"index": index, "status": "failed", "error": str(exc)} for index in indexes]
+
+    return [{"index": index, "status": "queued"} for index in indexes]
+
+
+@app.post("/logs/batch")
+async def logs_batch(
+    log_entry_schemas: Annotated[list[LogEntrySchema], Field(min_length=1, max_length=MAX_BATCH_ENTRIES)]
+) -> dict[str, Any]:
+    """
+    Endpoint to handle a batch of log entries.
+
+    Entries are queued with SendMessageBatch in groups of 10, or packed into compressed
+    envelopes holding many entries per message when SQS_ENVELOPE_ENABLED is set.
+    """
+    logging.debug(f"Received batch of {len(log_entry_schemas)} log entries")
+    bodies = [encode_log_entry(entry) for entry in log_entry_schemas]
+
+    if settings.SQS_ENVELOPE_ENABLED:
+        groups, send = pack_envelopes(bodies), send_log_entries_envelope
+    else:
+        groups, send = list(batched(bodies, SQS_MAX_BATCH_SIZE)), send_log_entries_batch
+
+    offsets = [0, *accumulate(len(group) for group in groups[:-1])]
+    batch_results = await asyncio.gather(
+        *(send(group, offset) for group, offset in zip(groups, offsets)), return_exceptions=True
+    )
+    results, circuit_open = [], None
+    for group, offset, batch in zip(groups, offsets, batch_results):
+        if isinstance(batch, CircuitOpenError):
+            circuit_open = batch
+            batch = [{"index": offset + index, "status": "failed", "error": str(batch)} for index in range(len(group))]
+        elif isinstance(batch, BaseException):
+            raise batch
+        results.extend(batch)
+    results.sort(key=lambda result: result["index"])
+
+    failed = sum(1 for result in results if result["status"] == "failed")
+    metrics.incr("api.entries_accepted", len(results) - failed)
+    metrics.incr("api.entries_failed", failed)
+    if failed == len(results):
+        if circuit_open is not None:
+            raise SQSUnavailableError(circuit_open.retry_after)
+        raise SQSClientError(results[0]["error"])
+
+    return {"queued": len(results) - failed, "failed": failed, "results": results}
+
+
 @app.get("/logs")
-async def get_logs(db: AsyncSession = Depends(get_async_db)):
-    """Retrieve the latest log entries from the database."""
-    query = select(LogEntry).order_by(LogEntry.timestamp.desc()).limit(5)
-    result = await db.execute(query)
-    logs = result.scalars().all()
-
-    return [
-        {
-            "id": log.id,
-            "event_id": log.event_id,
-            "message": log.message,
-            "level": log.level,
-            "timestamp": log.timestamp.isoformat(),
-        }
-        for log in logs
-    ]
+async def get_logs(
+    request: Request,
+    filters: LogFilters = Depends(log_filters),
+    cursor: str | None = Query(None, description="Cursor returned in X-Next-Cursor by the previous page"),
+    limit: int = Query(5, ge=1, le=MAX_PAGE_SIZE),
+    db: "AsyncSession" = Depends(get_async_db),
+):
+    """
+    Retrieve log entries from the database, newest first.
+
+    Besides `level`, `since` and `until`, entries can be filtered on their attributes with
+    attr.<key>=<value> parameters, e.g. attr.service=checkout, which the GIN index on
+    attributes serves.
+
+    When more entries may follow, the cursor of the next page is returned in the
+    X-Next-Cursor response header.
+
+    The ETag of a page is derived from the query parameters and the version of the log
+    entries, a single-row counter the worker bumps in every transaction that stores
+    entries and the maintenance task bumps when it removes expired ones, so a poll sending
+    it back in If-None-Match gets 304 Not Modified without running the page query.
+    Serialized pages are also cached for LOGS_CACHE_TTL_SECONDS under the same key.
+    """
+    from api.queries import encode_cursor, log_page_query, serialize_log_entry, version_query
+
+    with metrics.timer("api.db_version_ms"):
+        version = await db.scalar(version_query())
+    etag = make_etag(version, filters, cursor, limit)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        metrics.incr("api.logs_not_modified")
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+    page = logs_cache.get(etag)
+    if page is None:
+        metrics.incr("api.logs_cache_misses")
+        with metrics.timer("api.db_query_ms"):
+            result = await db.execute(log_page_query(filters, cursor, limit))
+            logs = result.scalars().all()
+        next_cursor = encode_cursor(logs[-1]) if len(logs) == limit else None
+        page = (codec.dumps([serialize_log_entry(log) for log in logs]).encode(), next_cursor)
+        logs_cache.set(etag, page)
+    else:
+        metrics.incr("api.logs_cache_hits")
+
+    body, next_cursor = page
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/logs/search")
+async def search_logs(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=256, description="Words, quoted phrases, OR and -word exclusions"),
+    mode: Literal["text", "substring"] = Query("text", description="Full-text match or case-insensitive substring"),
+    order: Literal["recent", "rank"] = Query("recent", description="Newest first (paginated) or best matches first"),
+    filters: LogFilters = Depends(log_filters),
+    cursor: str | None = Query(None, description="Cursor returned in X-Next-Cursor by the previous page"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: "AsyncSession" = Depends(get_async_db),
+):
+    """
+    Search log messages.
+
+    Text mode matches the GIN indexed search vector of the message and scores every
+    result with its rank. Results are paginated newest first like GET /logs, or, with
+    order=rank, only the `limit` best matches are returned, without further pages.
+    """
+    if mode == "substring" and order == "rank":
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Substring matches cannot be ranked")
+    if order == "rank" and cursor is not None:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Matches ordered by rank are not paginated")
+
+    from api.queries import encode_cursor, search_query, serialize_log_entry
+
+    with metrics.timer("api.db_query_ms"):
+        result = await db.execute(search_query(q, mode, order, filters, cursor, limit))
+        rows = result.all()
+
+    if order == "recent" and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].LogEntry)
+
+    return [serialize_log_entry(row.LogEntry) | {"rank": row.rank} for row in rows]
+
+
+@app.get("/logs/export")
+async def export_logs(
+    export_format: ExportFormat = Query("ndjson", alias="format", description="NDJSON or CSV with a header row"),
+    filters: LogFilters = Depends(log_filters),
+    limit: int | None = Query(None, ge=1, description="Export at most this many entries"),
+) -> StreamingResponse:
+    """
+    Export the matching log entries, oldest first, as a streamed NDJSON or CSV download.
+
+    Rows are streamed from a server-side cursor with chunked transfer encoding, so memory
+    use does not grow with the number of exported rows. Behind Lambda, Mangum buffers the
+    whole response, which is then limited to the 6 MB Lambda response size; run the API as
+    a container for large exports.
+    """
+    from api.export import EXPORT_MEDIA_TYPES, export_query, stream_log_entries
+
+    return StreamingResponse(
+        stream_log_entries(export_query(filters, limit), export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="logs.{export_format}"'},
+    )
+
+
+@app.get("/logs/stats")
+async def get_log_stats(
+    interval: StatsInterval = Query("hour", description="Width of the returned time buckets"),
+    filters: LogFilters = Depends(log_filters),
+    db: "AsyncSession" = Depends(get_async_db),
+) -> list[dict[str, Any]]:
+    """
+    Count the stored log entries per level and time bucket, oldest bucket first.
+
+    Counts are read from the per-minute rollups maintained by the worker, so `since` and
+    `until` have a resolution of one minute and attribute filters are not supported.
+    Buckets without entries are left out.
+    """
+    if filters.attributes:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Stats cannot be filtered on attributes")
+
+    from api.stats import serialize_stats_row, stats_query
+
+    with metrics.timer("api.db_query_ms"):
+        result = await db.execute(stats_query(filters, interval))
+        rows = result.all()
+    return [serialize_stats_row(row) for row in rows]
+
+
+if metrics.enabled and not running_in_lambda():
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics() -> PlainTextResponse:
+        """Expose the process metrics in the Prometheus text format."""
+        return PlainTextResponse(metrics.to_prometheus(settings.METRICS_PREFIX), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+mangum_handler = Mangum(app)
+
 
+def handler(event: dict, context: Any) -> dict[str, Any]:
+    """
+    AWS Lambda handler, printing the metrics of the request as an EMF log line.
 
-handler = Mangum(app)
+    SQS sends stop retrying in time to answer before the invocation times out.
+    """
+    remaining_ms = getattr(context, "get_remaining_time_in_millis", None)
+    deadline = remaining_ms() / 1000 - LAMBDA_RESPONSE_MARGIN_SECONDS if remaining_ms else None
+    with send_deadline(deadline):
+        response = mangum_handler(event, context)
+    emit_emf(metrics, "api")
+    return response
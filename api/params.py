@@ -0,0 +1,79 @@
+"""
+Query parameters of the endpoints reading log entries.
+
+Kept apart from the query builders in `api.queries`, `api.export` and `api.stats` so that
+declaring the routes does not import SQLAlchemy: the ingestion endpoints never touch the
+database, and a cold start serving them does not pay for loading it.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http import HTTPStatus
+from typing import Literal
+
+from fastapi import HTTPException, Query, Request
+
+from shared.schemas import MAX_ATTRIBUTE_KEY_LENGTH, MAX_ATTRIBUTES, LogLevel
+
+# Upper bound for the page size of the list endpoints
+MAX_PAGE_SIZE = 1000
+
+# Query parameters named ATTRIBUTE_FILTER_PREFIX + key filter on the attribute `key`
+ATTRIBUTE_FILTER_PREFIX = "attr."
+
+ExportFormat = Literal["ndjson", "csv"]
+
+StatsInterval = Literal["minute", "hour", "day"]
+
+
+@dataclass(frozen=True)
+class LogFilters:
+    """Filters shared by the endpoints that read log entries."""
+
+    levels: tuple[str, ...] = ()
+    since: datetime | None = None
+    until: datetime | None = None
+    # (key, accepted values) pairs, sorted by key
+    attributes: tuple[tuple[str, tuple[str, ...]], ...] = ()
+
+
+def as_utc(value: datetime | None) -> datetime | None:
+    """Return `value` as an aware datetime, reading naive values as UTC."""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+def attribute_filters(request: Request) -> tuple[tuple[str, tuple[str, ...]], ...]:
+    """
+    Parse the attr.<key>=<value> query parameters into (key, values) pairs.
+
+    Repeating a key accepts any of its values, like `level`; different keys must all match.
+    """
+    filters: dict[str, list[str]] = {}
+    for name, value in request.query_params.multi_items():
+        if name.startswith(ATTRIBUTE_FILTER_PREFIX):
+            key = name.removeprefix(ATTRIBUTE_FILTER_PREFIX)
+            if not key or len(key) > MAX_ATTRIBUTE_KEY_LENGTH:
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"Invalid attribute filter {name!r}")
+            filters.setdefault(key, []).append(value)
+    if len(filters) > MAX_ATTRIBUTES:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Too many attribute filters")
+    return tuple((key, tuple(dict.fromkeys(values))) for key, values in sorted(filters.items()))
+
+
+def log_filters(
+    request: Request,
+    level: list[LogLevel] | None = Query(None, description="Only return entries with one of these levels"),
+    since: datetime | None = Query(None, description="Only return entries logged at or after this time"),
+    until: datetime | None = Query(None, description="Only return entries logged before this time"),
+) -> LogFilters:
+    """
+    FastAPI dependency parsing the log entry filters from the query string.
+
+    Besides the declared parameters, attr.<key>=<value> parameters only return entries
+    whose attribute `key` equals `value` (see `attribute_filters`).
+    """
+    return LogFilters(
+        levels=tuple(level or ()), since=as_utc(since), until=as_utc(until), attributes=attribute_filters(request)
+    )
@@ -0,0 +1,139 @@
+import base64
+import binascii
+import math
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import Select, func, literal, or_, select, tuple_
+
+from api.params import LogFilters, as_utc
+from shared.codec import codec
+from shared.models.log_entries_version import LogEntriesVersion
+from shared.models.log_entry import TEXT_SEARCH_CONFIG, LogEntry
+from shared.schemas import AttributeValue
+
+
+class InvalidCursorError(HTTPException):
+    """Raised when a pagination cursor cannot be decoded."""
+
+    def __init__(self):
+        super().__init__(status_code=HTTPStatus.BAD_REQUEST, detail="Invalid cursor")
+
+
+def attribute_values(value: str) -> list[AttributeValue]:
+    """
+    Return the attribute values a query string value matches.
+
+    Attributes keep their JSON type, so "500" matches both the string and the number 500,
+    and "true" both the string and the boolean.
+    """
+    values: list[AttributeValue] = [value]
+    if value in ("true", "false"):
+        values.append(value == "true")
+        return values
+    try:
+        values.append(int(value))
+    except ValueError:
+        try:
+            number = float(value)
+        except ValueError:
+            return values
+        if math.isfinite(number):
+            values.append(number)
+    return values
+
+
+def apply_log_filters(query: Select, filters: LogFilters) -> Select:
+    """
+    Restrict a log entry query to the given filters.
+
+    Attribute filters are containment (@>) tests, which the GIN index on attributes
+    serves; a key accepting several values is an OR of such tests.
+    """
+    if filters.levels:
+        query = query.where(LogEntry.level.in_(filters.levels))
+    if filters.since is not None:
+        query = query.where(LogEntry.timestamp >= filters.since)
+    if filters.until is not None:
+        query = query.where(LogEntry.timestamp < filters.until)
+    for key, values in filters.attributes:
+        query = query.where(
+            or_(*(LogEntry.attributes.contains({key: match}) for value in values for match in attribute_values(value)))
+        )
+    return query
+
+
+def escape_like(value: str) -> str:
+    """Escape the LIKE wildcards in `value`, using backslash as escape character."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def encode_cursor(log_entry: LogEntry) -> str:
+    """Encode the keyset position after `log_entry` as an opaque cursor."""
+    position = [log_entry.timestamp.isoformat(), log_entry.id]  # pyright: ignore
+    return base64.urlsafe_b64encode(codec.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by `encode_cursor` into a (timestamp, id) position."""
+    try:
+        timestamp, log_entry_id = codec.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return as_utc(datetime.fromisoformat(timestamp)), int(log_entry_id)  # pyright: ignore
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursorError()
+
+
+def paginate(query: Select, cursor: str | None, limit: int) -> Select:
+    """
+    Order a log entry query newest first and restrict it to the page after `cursor`.
+
+    Pages are addressed by the (timestamp, id) of the last entry of the previous page
+    instead of an OFFSET, so the composite index serves every page in O(page size).
+    """
+    if cursor is not None:
+        timestamp, log_entry_id = decode_cursor(cursor)
+        # The redundant bound on timestamp alone lets Postgres prune newer partitions
+        query = query.where(
+            LogEntry.timestamp <= timestamp, tuple_(LogEntry.timestamp, LogEntry.id) < (timestamp, log_entry_id)
+        )
+    return query.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc()).limit(limit)
+
+
+def version_query() -> Select:
+    """Select the version of the log entries, bumped by every write that changes them."""
+    return select(LogEntriesVersion.version)
+
+
+def log_page_query(filters: LogFilters, cursor: str | None, limit: int) -> Select:
+    """Select a page of the log entries matching `filters`, newest first."""
+    return paginate(apply_log_filters(select(LogEntry), filters), cursor, limit)
+
+
+def search_query(q: str, mode: str, order: str, filters: LogFilters, cursor: str | None, limit: int) -> Select:
+    """Select the log entries whose message matches `q` and their rank, empty in substring mode."""
+    if mode == "substring":
+        rank = literal(None)
+        condition = LogEntry.message.ilike(f"%{escape_like(q)}%", escape="\\")
+    else:
+        ts_query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, q)
+        rank = func.ts_rank_cd(LogEntry.message_tsv, ts_query)
+        condition = LogEntry.message_tsv.op("@@")(ts_query)
+
+    query = apply_log_filters(select(LogEntry, rank.label("rank")).where(condition), filters)
+    if order == "rank":
+        return query.order_by(rank.desc(), LogEntry.timestamp.desc(), LogEntry.id.desc()).limit(limit)
+    return paginate(query, cursor, limit)
+
+
+def serialize_log_entry(log: LogEntry) -> dict[str, Any]:
+    """Serialize a log entry for the API responses."""
+    return {
+        "id": log.id,
+        "event_id": log.event_id,
+        "message": log.message,
+        "level": log.level,
+        "timestamp": log.timestamp.isoformat(),  # pyright: ignore
+        "attributes": log.attributes,
+    }
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+from shared.config import settings
+
+
+class SQSMessageBatcher:
+    """
+    Coalesce concurrent single-message sends into SendMessageBatch calls.
+
+    Messages are buffered until `max_batch_size` of them are pending or `linger` seconds have
+    passed since the first one arrived, whichever comes first, and are then flushed with a
+    single SendMessageBatch call. Each caller awaits the acknowledgement of its own message,
+    so a failed entry only fails the request that submitted it. At most `max_pending`
+    messages can wait for acknowledgement at any time; further senders wait for room.
+    """
+
+    def __init__(self, sqs: Any, max_batch_size: int = 10, linger: float = 0.005, max_pending: int = 1000):
+        self.sqs = sqs
+        self.max_batch_size = max_batch_size
+        self.linger = linger
+        self._capacity = asyncio.Semaphore(max_pending)
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_timer: asyncio.TimerHandle | None = None
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    async def send(self, message_body: str) -> dict[str, Any]:
+        """Queue a message for the next batch and wait until SQS acknowledges it."""
+        async with self._capacity:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending.append((message_body, future))
+
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = loop.call_later(self.linger, self._flush)
+
+            return await future
+
+    def _flush(self) -> None:
+        """Hand the pending messages over to a background SendMessageBatch call."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._send_batch(batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _send_batch(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        """Send one batch and resolve the future of every message in it."""
+        entries = [{"Id": str(index), "MessageBody": body} for index, (body, _) in enumerate(batch)]
+        try:
+            response = await self.sqs.send_message_batch(QueueUrl=settings.QUEUE_URL, Entries=entries)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        logging.debug(f"Flushed {len(batch)} coalesced messages to SQS")
+        for item in response.get("Successful", []):
+            future = batch[int(item["Id"])][1]
+            if not future.done():
+                future.set_result(item)
+        for item in response.get("Failed", []):
+            future = batch[int(item["Id"])][1]
+            if not future.done():
+                error = {"Error": {"Code": item.get("Code", ""), "Message": item.get("Message", "")}}
+                future.set_exception(ClientError(error, "SendMessageBatch"))  # pyright: ignore
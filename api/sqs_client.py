@@ -1,3 +1,20 @@
-import boto3
+from api.sqs_resilience import CircuitBreaker, ResilientSQSClient
+from shared.config import settings
+from shared.sqs import AsyncSQSClient
 
-sqs = boto3.client("sqs")
+# Retries are made by ResilientSQSClient, with backoff and a circuit breaker, so botocore's
+# own retries are disabled and every attempt is bounded by the connect and read timeouts
+sqs = ResilientSQSClient(
+    AsyncSQSClient(
+        max_connections=settings.SQS_MAX_CONNECTIONS,
+        retries={"total_max_attempts": 1},
+        connect_timeout=settings.SQS_CONNECT_TIMEOUT_SECONDS,
+        read_timeout=settings.SQS_READ_TIMEOUT_SECONDS,
+    ),
+    CircuitBreaker(
+        failure_threshold=settings.SQS_BREAKER_FAILURE_THRESHOLD, reset_timeout=settings.SQS_BREAKER_RESET_SECONDS
+    ),
+    max_attempts=settings.SQS_MAX_ATTEMPTS,
+    base_delay=settings.SQS_RETRY_BASE_DELAY_MS / 1000,
+    max_delay=settings.SQS_RETRY_MAX_DELAY_MS / 1000,
+)
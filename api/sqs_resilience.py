@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Iterator
+
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+from shared.metrics import metrics
+
+# Error codes of throttled requests and server-side failures, which may succeed when retried
+RETRYABLE_ERROR_CODES = frozenset(
+    {
+        "InternalError",
+        "InternalFailure",
+        "KMS.ThrottlingException",
+        "RequestThrottled",
+        "ServiceUnavailable",
+        "Throttling",
+        "ThrottlingException",
+    }
+)
+
+# Monotonic time by which the current request must have stopped retrying, if bounded
+_send_deadline: ContextVar[float | None] = ContextVar("sqs_send_deadline", default=None)
+
+
+@contextmanager
+def send_deadline(seconds: float | None) -> Iterator[None]:
+    """Stop retrying SQS sends made within the block once `seconds` have passed."""
+    token = _send_deadline.set(None if seconds is None else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _send_deadline.reset(token)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Tell whether a failed SQS call may succeed when retried."""
+    if isinstance(exc, (ConnectionError, HTTPClientError)):
+        return True
+    if isinstance(exc, ClientError):
+        error = exc.response.get("Error", {})
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return error.get("Code") in RETRYABLE_ERROR_CODES or status >= 500
+    return False
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling SQS while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"SQS calls are suspended for {retry_after:.1f}s after repeated failures")
+        self.retry_after = retry_after
+
+
+class BreakerState(IntEnum):
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitBreaker:
+    """
+    Fail fast after `failure_threshold` consecutive failed calls.
+
+    Once open, calls are rejected for `reset_timeout` seconds. The breaker then lets a
+    single probe through: it closes when the probe succeeds and opens again when it fails.
+    """
+
+    def __init__(
+        self, failure_threshold: int = 5, reset_timeout: float = 10.0, clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> BreakerState:
+        if self._opened_at is None:
+            return BreakerState.CLOSED
+        if self._clock() - self._opened_at < self.reset_timeout:
+            return BreakerState.OPEN
+        return BreakerState.HALF_OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a call through again."""
+        if self._opened_at is None:
+            return 0.0
+        return max(self._opened_at + self.reset_timeout - self._clock(), 0.0)
+
+    def allow(self) -> bool:
+        """Tell whether a call may be made now, reserving the probe when half open."""
+        state = self.state
+        if state is BreakerState.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return state is BreakerState.CLOSED
+
+    def release(self) -> None:
+        """Give up the probe reserved by `allow` without an outcome, e.g. when the call was cancelled."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logging.info("SQS circuit breaker closed")
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        metrics.gauge("api.sqs_breaker_state", int(BreakerState.CLOSED))
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+            logging.warning(f"SQS circuit breaker opened after {self._failures} consecutive failures")
+            self._opened_at = self._clock()
+            self._probing = False
+            metrics.incr("api.sqs_breaker_opened")
+            metrics.gauge("api.sqs_breaker_state", int(BreakerState.OPEN))
+
+
+class _RetryableEntries(Exception):
+    """Some entries of a SendMessageBatch call failed with a retryable error."""
+
+    def __init__(self, response: dict[str, Any]):
+        self.response = response
+
+
+class ResilientSQSClient:
+    """
+    Send messages through `sqs`, retrying throttled and failed calls.
+
+    Retries wait for a random delay of up to `base_delay * 2 ** attempt` seconds, capped at
+    `max_delay` (full jitter), so that clients failed by the same hiccup do not retry in
+    lockstep. A call makes at most `max_attempts` attempts and stops retrying before the
+    deadline set with `send_deadline`, typically the time left of the Lambda invocation.
+    Every attempt goes through `breaker`, so that once SQS keeps failing, calls fail fast
+    with `CircuitOpenError` instead of piling up retries.
+
+    Entries of a SendMessageBatch call rejected for a retryable reason are sent again on
+    their own; those still failing after the last attempt are reported as failed.
+    """
+
+    def __init__(
+        self,
+        sqs: Any,
+        breaker: CircuitBreaker,
+        max_attempts: int = 4,
+        base_delay: float = 0.05,
+        max_delay: float = 1.0,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.sqs = sqs
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+
+    async def send_message(self, **kwargs) -> dict[str, Any]:
+        return await self._retry(lambda: self.sqs.send_message(**kwargs))
+
+    async def send_message_batch(self, **kwargs) -> dict[str, Any]:
+        pending = kwargs["Entries"]
+        successful: list[dict[str, Any]] = []
+        rejected: list[dict[str, Any]] = []
+
+        async def send() -> dict[str, Any]:
+            nonlocal pending
+            response = await self.sqs.send_message_batch(**(kwargs | {"Entries": pending}))
+            successful.extend(response.get("Successful", []))
+            retryable = []
+            for item in response.get("Failed", []):
+                if not item.get("SenderFault") and item.get("Code") in RETRYABLE_ERROR_CODES:
+                    retryable.append(item)
+                else:
+                    rejected.append(item)
+            response = {"Successful": successful, "Failed": rejected + retryable}
+            if retryable:
+                retry_ids = {item["Id"] for item in retryable}
+                pending = [entry for entry in pending if entry["Id"] in retry_ids]
+                raise _RetryableEntries(response)
+            return response
+
+        return await self._retry(send)
+
+    def backoff(self, attempt: int) -> float:
+        """Return the delay before retrying after the `attempt`-th failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def _retry(self, call: Callable[[], Awaitable[dict[str, Any]]]) -> dict[str, Any]:
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self.breaker.allow():
+                metrics.incr("api.sqs_breaker_rejected")
+                raise CircuitOpenError(self.breaker.retry_after())
+            try:
+                response = await call()
+            except Exception as exc:
+                if not isinstance(exc, _RetryableEntries) and not is_retryable(exc):
+                    # SQS answered, so it is up: the request itself is at fault
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                error = exc
+            except BaseException:
+                # Cancelled before SQS answered: let the next call probe instead
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                return response
+
+            delay = self.backoff(attempt)
+            deadline = _send_deadline.get()
+            if attempt >= self.max_attempts or (deadline is not None and time.monotonic() + delay >= deadline):
+                metrics.incr("api.sqs_retries_exhausted")
+                if isinstance(error, _RetryableEntries):
+                    return error.response
+                raise error
+            logging.debug(f"Retrying SQS call in {delay * 1000:.0f}ms after attempt {attempt} failed: {error}")
+            metrics.incr("api.sqs_retries")
+            await self._sleep(delay)
@@ -0,0 +1,33 @@
+from typing import Any
+
+from sqlalchemy import Select, func, literal, select
+
+from api.params import LogFilters, StatsInterval
+from shared.models.log_rollup import LogRollup
+
+
+def stats_query(filters: LogFilters, interval: StatsInterval) -> Select:
+    """
+    Sum the per-minute rollups matching `filters` into `interval` buckets, oldest first.
+
+    Only the rollups are read, so the cost depends on the number of buckets in the time
+    range rather than on the number of log entries. The time range is applied to whole
+    minutes: a minute is included when it starts within [since, until).
+    """
+    # Rendered inline, since Postgres only matches the GROUP BY expression to the selected
+    # one when both use the same literals
+    unit, time_zone = literal(interval, literal_execute=True), literal("UTC", literal_execute=True)
+    bucket = func.date_trunc(unit, LogRollup.bucket, time_zone).label("bucket")
+    query = select(bucket, LogRollup.level, func.sum(LogRollup.count).label("count"))
+    if filters.levels:
+        query = query.where(LogRollup.level.in_(filters.levels))
+    if filters.since is not None:
+        query = query.where(LogRollup.bucket >= filters.since)
+    if filters.until is not None:
+        query = query.where(LogRollup.bucket < filters.until)
+    return query.group_by(bucket, LogRollup.level).order_by(bucket, LogRollup.level)
+
+
+def serialize_stats_row(row: Any) -> dict[str, Any]:
+    """Serialize a row of `stats_query` for the API response."""
+    return {"bucket": row.bucket.isoformat(), "level": row.level, "count": int(row.count)}
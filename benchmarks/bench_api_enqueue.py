@@ -0,0 +1,92 @@
+"""
+Benchmark concurrent POST /logs throughput with a blocking and a non-blocking SQS transport.
+
+The SQS stand-in sleeps for a fixed latency on every call to emulate the network round trip,
+so the benchmark runs offline. Usage:
+
+    python -m benchmarks.bench_api_enqueue --requests 500 --concurrency 50 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from unittest.mock import patch
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from httpx import ASGITransport, AsyncClient
+
+from api.main import app
+from shared.sqs import AsyncSQSClient
+
+
+class LocalSQS:
+    """Minimal boto3-like SQS stand-in that blocks for `latency` seconds per call."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def send_message(self, **kwargs):
+        time.sleep(self.latency)
+        return {"MessageId": "local"}
+
+    def send_message_batch(self, **kwargs):
+        time.sleep(self.latency)
+        return {"Successful": [{"Id": entry["Id"]} for entry in kwargs["Entries"]], "Failed": []}
+
+
+class BlockingSQS:
+    """Reproduces the previous behaviour: the boto3 call runs directly on the event loop."""
+
+    def __init__(self, client):
+        self._client = client
+
+    async def send_message(self, **kwargs):
+        return self._client.send_message(**kwargs)
+
+    async def send_message_batch(self, **kwargs):
+        return self._client.send_message_batch(**kwargs)
+
+
+async def run(sqs, total: int, concurrency: int) -> float:
+    """Send `total` POST /logs requests with `concurrency` in flight and return requests per second."""
+    semaphore = asyncio.Semaphore(concurrency)
+    payload = {"message": "Benchmark log entry", "level": "INFO"}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+
+        async def post():
+            async with semaphore:
+                resp = await client.post("/logs", json=payload)
+                resp.raise_for_status()
+
+        with patch("api.main.sqs", sqs):
+            started = time.perf_counter()
+            await asyncio.gather(*(post() for _ in range(total)))
+            elapsed = time.perf_counter() - started
+
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    local_sqs = LocalSQS(args.latency_ms / 1000)
+    transports = {
+        "blocking (before)": BlockingSQS(local_sqs),
+        "thread pool (after)": AsyncSQSClient(client=local_sqs, max_connections=args.concurrency),
+    }
+    for name, sqs in transports.items():
+        throughput = asyncio.run(run(sqs, args.requests, args.concurrency))
+        print(f"{name:<22} {throughput:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark the memory use of GET /logs/export against materializing the same rows.
+
+Loads generated rows dated January 2001 into `log_entries` of the Postgres configured
+through the `POSTGRES_*` settings, then exports increasing numbers of them through the
+ASGI app, discarding the streamed body as it arrives, and compares the peak Python heap
+(tracemalloc) with loading the same rows with `.all()` and serializing them as a list,
+like GET /logs does. The generated rows are deleted afterwards. Usage:
+
+    python -m benchmarks.bench_export --rows 2000000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+import tracemalloc
+from datetime import datetime
+from urllib.parse import urlencode
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from sqlalchemy import create_engine, text
+
+from api.export import export_query
+from api.main import app
+from api.params import LogFilters
+from api.queries import serialize_log_entry
+from shared.codec import codec
+from shared.config import settings
+from shared.models.session import AsyncSessionLocal
+
+SINCE, UNTIL = "2001-01-01T00:00:00+00:00", "2001-02-01T00:00:00+00:00"
+
+
+async def export_through_app(limit: int) -> int:
+    """Run GET /logs/export through the ASGI app and return the number of body bytes streamed."""
+    query_string = urlencode({"since": SINCE, "until": UNTIL, "limit": limit}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/logs/export",
+        "raw_path": b"/logs/export",
+        "query_string": query_string,
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    received = 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # The client never disconnects; the app stops listening once the body is sent
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return received
+
+
+async def export_materialized(limit: int) -> int:
+    """Load the rows with `.all()` and serialize them as one list, the GET /logs pattern."""
+    filters = LogFilters(since=datetime.fromisoformat(SINCE), until=datetime.fromisoformat(UNTIL))
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(export_query(filters, limit))).all()
+        return len(codec.dumps([serialize_log_entry(row) for row in rows]))
+
+
+async def measure(export, limit: int) -> tuple[float, float, int]:
+    """Return the peak traced memory in MiB, the duration in seconds and the bytes produced."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    produced = await export(limit)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed, produced
+
+
+async def run(args) -> None:
+    print(f"{'rows':>10} {'mode':>13} {'peak MiB':>10} {'seconds':>9} {'MiB out':>9}")
+    limit = max(args.rows // 100, 1)
+    while limit <= args.rows:
+        modes = {"streamed": export_through_app}
+        if limit <= args.skip_materialized_above:
+            modes["materialized"] = export_materialized
+        for mode, export in modes.items():
+            peak, elapsed, produced = await measure(export, limit)
+            print(f"{limit:>10} {mode:>13} {peak:>10.1f} {elapsed:>9.2f} {produced / 2**20:>9.1f}")
+        limit *= 10
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--skip-materialized-above", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+    with engine.connect() as connection:
+        started = time.perf_counter()
+        connection.execute(
+            text(
+                "INSERT INTO log_entries (event_id, message, level, timestamp) "
+                "SELECT 'bench-export-' || n, 'Benchmark export entry ' || n || ' for order ' || n % 9973, "
+                "10 * (1 + n % 5), timestamptz '2001-01-01 00:00+00' + n * interval '1 millisecond' "
+                "FROM generate_series(1, :rows) AS n"
+            ),
+            {"rows": args.rows},
+        )
+        connection.commit()
+        print(f"Loaded {args.rows} rows in {time.perf_counter() - started:.1f}s\n")
+
+        try:
+            asyncio.run(run(args))
+        finally:
+            connection.execute(
+                text("DELETE FROM log_entries WHERE timestamp >= :since AND timestamp < :until"),
+                {"since": SINCE, "until": UNTIL},
+            )
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
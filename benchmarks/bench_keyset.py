@@ -0,0 +1,85 @@
+"""
+Benchmark keyset pagination against OFFSET pagination on a large log table.
+
+Fills a scratch copy of `log_entries` (with the same indexes) with generated rows in the
+configured Postgres database, then times fetching pages at increasing depths with both
+strategies. The scratch table is dropped afterwards. Usage:
+
+    python -m benchmarks.bench_keyset --rows 2000000 --page-size 100
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+
+from shared.config import settings
+
+TABLE = "bench_log_entries"
+
+OFFSET_QUERY = text(
+    f"SELECT id, event_id, message, level, timestamp FROM {TABLE} "
+    "ORDER BY timestamp DESC, id DESC LIMIT :limit OFFSET :offset"
+)
+KEYSET_QUERY = text(
+    f"SELECT id, event_id, message, level, timestamp FROM {TABLE} "
+    "WHERE (timestamp, id) < (:timestamp, :id) ORDER BY timestamp DESC, id DESC LIMIT :limit"
+)
+
+
+def timed(connection, query, params, repeat: int) -> float:
+    """Return the median wall time of `query`, in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(query, params).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        connection.execute(text(f"CREATE TABLE {TABLE} (LIKE log_entries INCLUDING ALL)"))
+        started = time.perf_counter()
+        connection.execute(
+            text(
+                f"INSERT INTO {TABLE} (id, event_id, message, level, timestamp) "
+                "SELECT n, md5(n::text), 'Benchmark log entry ' || n, "
+                "10 * (1 + n % 5), "
+                "timestamptz '2024-01-01 00:00+00' + n * interval '10 milliseconds' "
+                "FROM generate_series(1, :rows) AS n"
+            ),
+            {"rows": args.rows},
+        )
+        connection.execute(text(f"ANALYZE {TABLE}"))
+        connection.commit()
+        print(f"Loaded {args.rows} rows in {time.perf_counter() - started:.1f}s\n")
+
+        try:
+            print(f"{'page':>10} {'OFFSET ms':>12} {'keyset ms':>12}")
+            depth = 1
+            while depth * args.page_size < args.rows:
+                offset = (depth - 1) * args.page_size
+                # Position of the last row of the previous page, as a client would hold it in its cursor
+                previous = connection.execute(OFFSET_QUERY, {"limit": 1, "offset": max(offset - 1, 0)}).one()
+                offset_ms = timed(connection, OFFSET_QUERY, {"limit": args.page_size, "offset": offset}, args.repeat)
+                keyset_params = {"timestamp": previous.timestamp, "id": previous.id, "limit": args.page_size}
+                keyset_ms = timed(connection, KEYSET_QUERY, keyset_params, args.repeat)
+                print(f"{depth:>10} {offset_ms:>12.2f} {keyset_ms:>12.2f}")
+                depth *= 10
+        finally:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+End-to-end load harness for the API and the worker.
+
+Drives `api.main.app` in process at a fixed concurrency, with enqueues going to a local
+SQS stand-in, while a consumer receives the queued messages, hands them to
+`worker.main.handle_event` in Lambda-sized batches and deletes them once committed. The
+worker writes to the `log_entries` table of the Postgres configured through the
+`POSTGRES_*` settings; the rows written by the run are deleted afterwards unless
+--keep-rows is given. Reports throughput and p50/p95/p99 latency per stage:
+
+- api: POST request latency, including the enqueue
+- queue: time between SQS accepting a message and the consumer receiving it
+- worker: duration of one handle_event invocation
+- end_to_end: time between SQS accepting a message and its batch being committed
+
+The SQS stand-in is an in-memory queue by default (--sqs local). moto (--sqs moto) is
+faithful to the SQS API but rescans the whole queue on every receive, so it becomes the
+bottleneck beyond a few thousand queued messages. --endpoint-url points the harness at
+an SQS compatible server such as ElasticMQ instead. Usage:
+
+    python -m benchmarks.bench_pipeline --requests 5000 --concurrency 50 --worker-batch-size 10
+    python -m benchmarks.bench_pipeline --endpoint batch --entries-per-request 100
+    python -m benchmarks.bench_pipeline --endpoint-url http://localhost:9324
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import ExitStack
+from typing import Any
+from unittest.mock import patch
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+import boto3
+from httpx import ASGITransport, AsyncClient
+from moto import mock_aws
+from sqlalchemy import delete, func, select
+
+import api.main
+from api.main import app
+from shared.config import settings
+from shared.models.log_entry import LogEntry
+from shared.models.session import AsyncSessionLocal
+from shared.sqs import AsyncSQSClient
+from worker.consumer import sqs_record
+from worker.main import handle_event
+
+# Largest number of messages a single ReceiveMessage call returns
+SQS_MAX_RECEIVE = 10
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+
+class LocalQueue:
+    """Minimal thread-safe, in-memory stand-in for the boto3 SQS operations used by the pipeline."""
+
+    def __init__(self, visibility_timeout: float = 30.0):
+        self.visibility_timeout = visibility_timeout
+        self._lock = threading.Lock()
+        self._visible: deque[dict[str, Any]] = deque()
+        self._in_flight: dict[str, tuple[float, dict[str, Any]]] = {}
+
+    def _enqueue(self, body: str) -> str:
+        message_id = str(uuid.uuid4())
+        sent_timestamp = str(int(time.time() * 1000))
+        with self._lock:
+            self._visible.append(
+                {"MessageId": message_id, "Body": body, "Attributes": {"SentTimestamp": sent_timestamp}}
+            )
+        return message_id
+
+    def send_message(self, MessageBody: str, **kwargs):
+        return {"MessageId": self._enqueue(MessageBody)}
+
+    def send_message_batch(self, Entries: list[dict[str, Any]], **kwargs):
+        successful = [{"Id": entry["Id"], "MessageId": self._enqueue(entry["MessageBody"])} for entry in Entries]
+        return {"Successful": successful, "Failed": []}
+
+    def receive_message(self, MaxNumberOfMessages: int = 1, **kwargs):
+        now = time.monotonic()
+        with self._lock:
+            for receipt_handle, (visible_at, message) in list(self._in_flight.items()):
+                if visible_at <= now:
+                    del self._in_flight[receipt_handle]
+                    self._visible.append(message)
+
+            messages = []
+            while self._visible and len(messages) < MaxNumberOfMessages:
+                message = self._visible.popleft()
+                receipt_handle = str(uuid.uuid4())
+                self._in_flight[receipt_handle] = (now + self.visibility_timeout, message)
+                messages.append({**message, "ReceiptHandle": receipt_handle})
+        return {"Messages": messages}
+
+    def delete_message_batch(self, Entries: list[dict[str, Any]], **kwargs):
+        with self._lock:
+            for entry in Entries:
+                self._in_flight.pop(entry["ReceiptHandle"], None)
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+
+class Stats:
+    """Latency samples per stage, in milliseconds."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+
+    def add(self, stage: str, milliseconds: float) -> None:
+        self.samples.setdefault(stage, []).append(milliseconds)
+
+    def report(self) -> None:
+        print(f"{'stage':<12} {'count':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+        for stage, samples in self.samples.items():
+            if len(samples) > 1:
+                percentiles = statistics.quantiles(samples, n=100, method="inclusive")
+                p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+            else:
+                p50 = p95 = p99 = samples[0]
+            print(f"{stage:<12} {len(samples):>8} {p50:>10.2f} {p95:>10.2f} {p99:>10.2f} {max(samples):>10.2f}")
+
+
+async def produce(client: AsyncClient, args, stats: Stats) -> None:
+    """Send all API requests with `args.concurrency` of them in flight."""
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def post(number: int):
+        entries = [
+            {"message": f"Load test entry {number}-{index}", "level": LEVELS[(number + index) % len(LEVELS)]}
+            for index in range(args.entries_per_request)
+        ]
+        async with semaphore:
+            started = time.perf_counter()
+            if args.endpoint == "batch":
+                resp = await client.post("/logs/batch", json=entries)
+            else:
+                resp = await client.post("/logs", json=entries[0])
+            stats.add("api", (time.perf_counter() - started) * 1000)
+            resp.raise_for_status()
+
+    await asyncio.gather(*(post(number) for number in range(args.requests)))
+
+
+async def consume(sqs: AsyncSQSClient, args, stats: Stats, producing: asyncio.Event) -> tuple[int, int, float]:
+    """
+    Feed queued messages to the worker until the producers are done and the queue is empty.
+
+    Returns the number of processed messages, the number of failed messages and the time
+    spent inside the worker, in seconds.
+    """
+    processed = failed = 0
+    worker_seconds = 0.0
+    while True:
+        messages = []
+        while len(messages) < args.worker_batch_size:
+            response = await sqs.receive_message(
+                QueueUrl=settings.QUEUE_URL,
+                MaxNumberOfMessages=min(SQS_MAX_RECEIVE, args.worker_batch_size - len(messages)),
+                AttributeNames=["SentTimestamp"],
+            )
+            if not response.get("Messages"):
+                break
+            messages.extend(response["Messages"])
+
+        if not messages:
+            if not producing.is_set():
+                return processed, failed, worker_seconds
+            await asyncio.sleep(0.01)
+            continue
+
+        received_at = time.time() * 1000
+        for message in messages:
+            stats.add("queue", received_at - int(message["Attributes"]["SentTimestamp"]))
+
+        started = time.perf_counter()
+        response = await handle_event({"Records": [sqs_record(message) for message in messages]})
+        elapsed = time.perf_counter() - started
+        worker_seconds += elapsed
+        stats.add("worker", elapsed * 1000)
+
+        committed_at = time.time() * 1000
+        failed_ids = {failure["itemIdentifier"] for failure in response["batchItemFailures"]}
+        committed = [message for message in messages if message["MessageId"] not in failed_ids]
+        for message in committed:
+            stats.add("end_to_end", committed_at - int(message["Attributes"]["SentTimestamp"]))
+        for start in range(0, len(committed), SQS_MAX_RECEIVE):
+            await sqs.delete_message_batch(
+                QueueUrl=settings.QUEUE_URL,
+                Entries=[
+                    {"Id": str(index), "ReceiptHandle": message["ReceiptHandle"]}
+                    for index, message in enumerate(committed[start : start + SQS_MAX_RECEIVE])
+                ],
+            )
+        processed += len(committed)
+        failed += len(failed_ids)
+
+
+async def count_rows(after_id: int = 0) -> tuple[int, int]:
+    """Return the number of rows with an id above `after_id` and the highest id."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(func.count(LogEntry.id), func.coalesce(func.max(LogEntry.id), 0)).where(LogEntry.id > after_id)
+        )
+        return tuple(result.one())  # pyright: ignore
+
+
+async def run(sqs: AsyncSQSClient, args) -> None:
+    stats = Stats()
+    _, last_id = await count_rows()
+
+    producing = asyncio.Event()
+    producing.set()
+
+    async def produce_all():
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+                with patch("api.main.sqs", sqs), patch.object(api.main.sqs_batcher, "sqs", sqs):
+                    await produce(client, args, stats)
+        finally:
+            producing.clear()
+
+    started = time.perf_counter()
+    producer = asyncio.create_task(produce_all())
+    consumers = [asyncio.create_task(consume(sqs, args, stats, producing)) for _ in range(args.consumers)]
+    await producer
+    api_seconds = time.perf_counter() - started
+    results = await asyncio.gather(*consumers)
+    total_seconds = time.perf_counter() - started
+
+    processed = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    worker_seconds = sum(result[2] for result in results) / args.consumers
+    rows, _ = await count_rows(last_id)
+    entries = args.requests * args.entries_per_request
+
+    print(f"API:    {args.requests / api_seconds:10.1f} req/s {entries / api_seconds:10.1f} entries/s")
+    print(f"Worker: {processed} messages committed, {failed} failed, {rows} rows written")
+    print(f"DB:     {rows / worker_seconds:10.1f} rows/s while the worker was busy")
+    print(f"Total:  {entries / total_seconds:10.1f} entries/s end to end over {total_seconds:.1f}s\n")
+    stats.report()
+
+    if not args.keep_rows:
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(LogEntry).where(LogEntry.id > last_id))
+            await session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--endpoint", choices=["single", "batch"], default="single")
+    parser.add_argument("--entries-per-request", type=int, default=1, help="Entries per /logs/batch request")
+    parser.add_argument("--worker-batch-size", type=int, default=10, help="Messages per handle_event invocation")
+    parser.add_argument("--consumers", type=int, default=1, help="Concurrent worker invocations")
+    parser.add_argument("--sqs", choices=["local", "moto"], default="local", help="SQS stand-in")
+    parser.add_argument("--endpoint-url", help="Use the SQS compatible server at this URL, e.g. ElasticMQ")
+    parser.add_argument("--keep-rows", action="store_true", help="Keep the rows written by the run")
+    args = parser.parse_args()
+    if args.endpoint == "single":
+        args.entries_per_request = 1
+    logging.disable(logging.INFO)
+
+    with ExitStack() as stack:
+        if args.endpoint_url or args.sqs == "moto":
+            if not args.endpoint_url:
+                stack.enter_context(mock_aws())
+            client = boto3.client("sqs", endpoint_url=args.endpoint_url)
+            settings.QUEUE_URL = client.create_queue(QueueName="bench-pipeline")["QueueUrl"]
+        else:
+            client = LocalQueue()
+            settings.QUEUE_URL = "local://bench-pipeline"
+        asyncio.run(run(AsyncSQSClient(client=client, max_connections=args.concurrency), args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark POST /logs while SQS throttles and goes down, with and without the retry layer.
+
+The SQS stand-in sleeps for a fixed latency per call, throttles a fraction of the calls at
+random and fails every call during an outage window. Clients keep posting for `--seconds`
+and resend failed entries, right away on a 500 like most clients do, or after the
+Retry-After delay of a 503. Reports the entries queued, the SQS calls made, how many of
+them fell in the outage, and the latency percentiles of the accepted entries. Usage:
+
+    python -m benchmarks.bench_sqs_faults --clients 50 --seconds 6 --outage 2:4 --throttle-rate 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+from unittest.mock import patch
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from botocore.exceptions import ClientError
+from httpx import ASGITransport, AsyncClient
+
+from api.main import app
+from api.sqs_resilience import CircuitBreaker, ResilientSQSClient
+from shared.config import settings
+from shared.sqs import AsyncSQSClient
+
+
+class FaultySQS:
+    """boto3-like SQS stand-in that throttles at random and fails every call during an outage."""
+
+    def __init__(self, latency: float, throttle_rate: float, outage: tuple[float, float]):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.outage = outage
+        self.started = time.monotonic()
+        self.calls = 0
+        self.outage_calls = 0
+
+    def send_message(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        elapsed = time.monotonic() - self.started
+        if self.outage[0] <= elapsed < self.outage[1]:
+            self.outage_calls += 1
+            raise ClientError({"Error": {"Code": "ServiceUnavailable"}}, "SendMessage")  # pyright: ignore
+        if random.random() < self.throttle_rate:
+            raise ClientError({"Error": {"Code": "ThrottlingException"}}, "SendMessage")  # pyright: ignore
+        return {"MessageId": "local"}
+
+
+async def run(sqs, faulty_sqs: FaultySQS, clients: int, seconds: float) -> dict[str, float]:
+    """Post from `clients` concurrent clients for `seconds` and return the outcome."""
+    payload = {"message": "Benchmark log entry", "level": "INFO"}
+    latencies, rejected = [], 0
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+
+        async def post_until(deadline: float):
+            nonlocal rejected
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                while time.monotonic() < deadline:
+                    resp = await client.post("/logs", json=payload)
+                    if resp.status_code == 200:
+                        latencies.append((time.monotonic() - started) * 1000)
+                        break
+                    rejected += 1
+                    await asyncio.sleep(float(resp.headers.get("Retry-After", 0)))
+
+        with patch("api.main.sqs", sqs):
+            faulty_sqs.started = time.monotonic()
+            await asyncio.gather(*(post_until(faulty_sqs.started + seconds) for _ in range(clients)))
+
+    latencies.sort()
+    return {
+        "queued": len(latencies),
+        "rejected": rejected,
+        "sqs_calls": faulty_sqs.calls,
+        "outage_calls": faulty_sqs.outage_calls,
+        "p50_ms": statistics.median(latencies) if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--outage", default="2:4", help="Start and end of the outage, in seconds")
+    parser.add_argument("--throttle-rate", type=float, default=0.05)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--breaker-reset-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    start, end = (float(value) for value in args.outage.split(":"))
+    print(
+        f"{'transport':<24} {'queued':>7} {'rejected':>9} {'SQS calls':>10} {'in outage':>10} {'p50 ms':>8} {'p99 ms':>8}"
+    )
+    for name in ("no retries (before)", "retries + breaker"):
+        faulty_sqs = FaultySQS(args.latency_ms / 1000, args.throttle_rate, (start, end))
+        sqs = AsyncSQSClient(client=faulty_sqs, max_connections=args.clients)
+        if name == "retries + breaker":
+            breaker = CircuitBreaker(settings.SQS_BREAKER_FAILURE_THRESHOLD, reset_timeout=args.breaker_reset_seconds)
+            sqs = ResilientSQSClient(sqs, breaker, max_attempts=settings.SQS_MAX_ATTEMPTS)
+        result = asyncio.run(run(sqs, faulty_sqs, args.clients, args.seconds))
+        print(
+            f"{name:<24} {result['queued']:>7} {result['rejected']:>9} {result['sqs_calls']:>10}"
+            f" {result['outage_calls']:>10} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark the cold start of the Lambda handlers with `python -X importtime`.
+
+Every scenario runs in a fresh interpreter, like a new Lambda container: importing the
+API module, serving a first POST /logs through the Lambda handler with SQS stubbed out,
+serving a first GET /logs, and importing the worker module. Reports the median import
+time, the number of imported modules and which heavy dependencies were loaded. Usage:
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+# Dependencies whose import dominates the cold start of the handlers
+HEAVY_MODULES = ("fastapi", "mangum", "pydantic_settings", "boto3", "sqlalchemy", "asyncpg")
+
+_lambda_event = """
+def lambda_event(method, path, body=None):
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"content-type": "application/json", "host": "bench"},
+        "requestContext": {
+            "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+            "stage": "$default",
+        },
+        "body": body,
+        "isBase64Encoded": False,
+    }
+"""
+
+SCENARIOS = {
+    "import api.main": "import api.main",
+    "POST /logs": _lambda_event
+    + textwrap.dedent(
+        """
+        from unittest.mock import AsyncMock
+
+        import api.main
+
+        api.main.sqs.send_message = AsyncMock(return_value={"MessageId": "bench"})
+        body = '{"message": "Cold start", "level": "INFO"}'
+        response = api.main.handler(lambda_event("POST", "/logs", body), None)
+        assert response["statusCode"] == 200, response
+        """
+    ),
+    "GET /logs": _lambda_event
+    + textwrap.dedent(
+        """
+        import api.main
+
+        response = api.main.handler(lambda_event("GET", "/logs"), None)
+        """
+    ),
+    "import worker.main": "import worker.main",
+}
+
+
+def import_profile(code: str) -> dict[str, tuple[int, int]]:
+    """
+    Run `code` in a fresh interpreter and return the modules it imported.
+
+    Maps every module to its self and cumulative import time in microseconds, as
+    reported by `-X importtime`.
+    """
+    env = {"AWS_DEFAULT_REGION": "us-east-1", "METRICS_ENABLED": "false"} | os.environ
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=Path(__file__).resolve().parents[1],
+        check=True,
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line.removeprefix("import time:").split("|")
+        profile[module.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def top_level_import_ms(profile: dict[str, tuple[int, int]], code: str) -> float:
+    """Return the time spent importing the project modules named in `code`, in milliseconds."""
+    roots = [module for module in profile if module.split(".")[0] in ("api", "worker") and f"import {module}" in code]
+    return sum(profile[module][1] for module in roots) / 1000
+
+
+def run(runs: int) -> None:
+    print(f"{'scenario':>20} {'wall ms':>9} {'import ms':>10} {'modules':>8}  heavy dependencies loaded")
+    for name, code in SCENARIOS.items():
+        wall, imports, profile = [], [], {}
+        for _ in range(runs):
+            started = time.perf_counter()
+            profile = import_profile(code)
+            wall.append((time.perf_counter() - started) * 1000)
+            imports.append(top_level_import_ms(profile, code))
+        heavy = ", ".join(module for module in HEAVY_MODULES if module in profile) or "-"
+        print(
+            f"{name:>20} {statistics.median(wall):>9.0f} {statistics.median(imports):>10.0f} {len(profile):>8}  {heavy}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark the write cost and on-disk size of the log table schema.
+
+Loads the same generated rows, in worker-sized batches and with the same
+INSERT ... SELECT unnest(...) ON CONFLICT DO NOTHING statement as the worker, into two
+scratch tables in the configured Postgres database:
+
+- legacy: VARCHAR level, TIMESTAMP timestamp and B-tree indexes on id and level
+- compact: SMALLINT level, TIMESTAMPTZ timestamp and a BRIN index on timestamp
+
+Both keep the primary key, the (event_id, timestamp) unique constraint, the
+(timestamp, id) keyset index and the message search vector. The tables are not
+partitioned, which does not change the per-row cost. Reports rows/s and the bytes per
+row of the heap and of the indexes. The scratch tables are dropped afterwards. Usage:
+
+    python -m benchmarks.bench_storage --rows 200000 --batch-size 100
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+from shared.config import settings
+from shared.models.log_entry import LOG_LEVELS
+
+LEVELS = list(LOG_LEVELS)
+
+COMMON_COLUMNS = """
+    id SERIAL,
+    event_id VARCHAR,
+    message VARCHAR,
+    message_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', coalesce(message, ''))) STORED
+"""
+
+SCHEMAS = {
+    "legacy": {
+        "columns": "level VARCHAR, timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL",
+        "level_type": "VARCHAR[]",
+        "timestamp_type": "TIMESTAMP[]",
+        "indexes": ["btree (id)", "btree (level)"],
+    },
+    "compact": {
+        "columns": "level SMALLINT, timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()",
+        "level_type": "SMALLINT[]",
+        "timestamp_type": "TIMESTAMPTZ[]",
+        "indexes": ["brin (timestamp)"],
+    },
+}
+
+
+def create_table(connection, table: str, schema: dict) -> None:
+    connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    connection.execute(
+        text(
+            f"CREATE TABLE {table} ({COMMON_COLUMNS}, {schema['columns']}, "
+            "PRIMARY KEY (id, timestamp), UNIQUE (event_id, timestamp))"
+        )
+    )
+    connection.execute(text(f"CREATE INDEX ON {table} (timestamp, id)"))
+    connection.execute(text(f"CREATE INDEX ON {table} USING gin (message_tsv)"))
+    for index in schema["indexes"]:
+        connection.execute(text(f"CREATE INDEX ON {table} USING {index}"))
+    connection.commit()
+
+
+def generate_batch(start: int, size: int, compact: bool) -> dict:
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    numbers = range(start, start + size)
+    timestamps = [started + timedelta(milliseconds=10 * n) for n in numbers]
+    levels = [LEVELS[n % len(LEVELS)] for n in numbers]
+    return {
+        "event_ids": [f"event-{n}" for n in numbers],
+        "messages": [f"Benchmark log entry {n} for order {n % 9973}" for n in numbers],
+        "levels": [LOG_LEVELS[level] for level in levels] if compact else levels,
+        "timestamps": timestamps if compact else [timestamp.replace(tzinfo=None) for timestamp in timestamps],
+    }
+
+
+def load(connection, table: str, schema: dict, rows: int, batch_size: int, compact: bool) -> float:
+    """Insert `rows` rows one committed batch at a time and return the rows per second."""
+    insert = text(
+        f"INSERT INTO {table} (event_id, message, level, timestamp) "
+        f"SELECT * FROM unnest(CAST(:event_ids AS VARCHAR[]), CAST(:messages AS VARCHAR[]), "
+        f"CAST(:levels AS {schema['level_type']}), CAST(:timestamps AS {schema['timestamp_type']})) "
+        "ON CONFLICT (event_id, timestamp) DO NOTHING"
+    )
+    started = time.perf_counter()
+    for start in range(0, rows, batch_size):
+        connection.execute(insert, generate_batch(start, min(batch_size, rows - start), compact))
+        connection.commit()
+    return rows / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+    print(f"{'schema':>10} {'rows/s':>10} {'heap B/row':>12} {'index B/row':>12} {'total B/row':>12}")
+    with engine.connect() as connection:
+        for name, schema in SCHEMAS.items():
+            table = f"bench_storage_{name}"
+            try:
+                create_table(connection, table, schema)
+                rows_per_second = load(connection, table, schema, args.rows, args.batch_size, name == "compact")
+                heap, indexes = connection.execute(
+                    text("SELECT pg_table_size(:table), pg_indexes_size(:table)"), {"table": table}
+                ).one()
+                print(
+                    f"{name:>10} {rows_per_second:>10.0f} {heap / args.rows:>12.1f} "
+                    f"{indexes / args.rows:>12.1f} {(heap + indexes) / args.rows:>12.1f}"
+                )
+            finally:
+                connection.rollback()
+                connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+                connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,7 @@ class ApiGatewayStack(Stack):
                     CorsHttpMethod.POST,
                 ],
                 allow_origins=["*"],
+                expose_headers=["X-Next-Cursor", "ETag"],
                 max_age=Duration.days(10),
             ),
         )
@@ -3,6 +3,8 @@ from aws_cdk import (
     Duration,
     Stack,
     aws_ec2 as ec2,
+    aws_events as events,
+    aws_events_targets as events_targets,
     aws_iam as iam,
     aws_lambda as _lambda,
     aws_lambda_event_sources as lambda_event_sources,
@@ -20,6 +22,7 @@ class LambdaStack(Stack):
     - API Handler: Handles incoming API requests and interacts with the database and SQS queue.
     - Worker: Processes messages from the SQS queue and writes log entries to the database.
     - Migration Handler: Runs database migrations.
+    - Maintenance Handler: Creates upcoming log_entries partitions and drops expired ones once a day.
 
     The stack also creates the necessary IAM roles and permissions for the Lambda functions.
     """
@@ -39,6 +42,7 @@ class LambdaStack(Stack):
         self.api_handler = self.create_api_lambda_function()
         self.worker_handler = self.create_worker_lambda_function()
         self.migration_handler = self.create_migration_lambda_function()
+        self.maintenance_handler = self.create_maintenance_lambda_function()
 
     def create_lambda_db_role(self):
         """Create an IAM role for Lambda functions with necessary database access and VPC permissions"""
@@ -169,7 +173,10 @@ class LambdaStack(Stack):
         )
 
         # Add an SQS event source to trigger the worker Lambda function
-        worker_handler.add_event_source(lambda_event_sources.SqsEventSource(self.queue, batch_size=BATCH_SIZE))
+        # The worker reports failed message IDs, so only those are retried instead of the whole batch
+        worker_handler.add_event_source(
+            lambda_event_sources.SqsEventSource(self.queue, batch_size=BATCH_SIZE, report_batch_item_failures=True)
+        )
         return worker_handler
 
     def create_worker_lambda_code(self):
@@ -233,3 +240,39 @@ class LambdaStack(Stack):
                 "POSTGRES_DB": DATABASE_NAME,
             },
         )
+
+    def create_maintenance_lambda_function(self):
+        """
+        Create a Lambda function that maintains the log_entries partitions.
+        The function runs once a day on an EventBridge schedule.
+        """
+        maintenance_handler = _lambda.Function(
+            self,
+            "MaintenanceHandler",
+            code=self.create_worker_lambda_code(),
+            runtime=_lambda.Runtime.PYTHON_3_11,
+            architecture=_lambda.Architecture.ARM_64,
+            handler="worker.maintenance.lambda_handler",
+            role=self.lambda_db_role,
+            memory_size=128,
+            timeout=Duration.seconds(60),
+            vpc=self.vpc,
+            vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS),
+            security_groups=[self.database.connections.security_groups[0]],
+            environment={
+                "POSTGRES_USER": self.database.secret.secret_value_from_json("username").unsafe_unwrap(),
+                "POSTGRES_SERVER": self.database.db_instance_endpoint_address,
+                "POSTGRES_PORT": str(self.database.db_instance_endpoint_port),
+                "POSTGRES_PASSWORD": self.database.secret.secret_value_from_json("password").unsafe_unwrap(),
+                "POSTGRES_DB": DATABASE_NAME,
+            },
+        )
+
+        # Run the partition maintenance once a day
+        events.Rule(
+            self,
+            "MaintenanceSchedule",
+            schedule=events.Schedule.rate(Duration.days(1)),
+            targets=[events_targets.LambdaFunction(maintenance_handler)],
+        )
+        return maintenance_handler
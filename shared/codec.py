@@ -0,0 +1,86 @@
+import json
+from typing import Any
+
+from pydantic import Json, TypeAdapter, ValidationError
+
+from shared.config import settings
+from shared.schemas import LogEntryPayload, LogEntrySchema
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class JSONCodec:
+    """JSON codec backed by the standard library."""
+
+    name = "json"
+
+    @staticmethod
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"), default=str)
+
+    @staticmethod
+    def loads(data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """JSON codec backed by orjson, several times faster than the standard library."""
+
+    name = "orjson"
+
+    @staticmethod
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=str).decode()  # pyright: ignore
+
+    @staticmethod
+    def loads(data: str | bytes) -> Any:
+        return orjson.loads(data)  # pyright: ignore
+
+
+def get_codec(name: str) -> type[JSONCodec] | type[OrjsonCodec]:
+    """Return the codec called `name`, falling back to the standard library if orjson is missing."""
+    if name == OrjsonCodec.name and orjson is not None:
+        return OrjsonCodec
+    return JSONCodec
+
+
+codec = get_codec(settings.JSON_CODEC)
+
+# Compiled pydantic-core validators, parsing JSON directly into validated dicts. The batch
+# validator parses every body on its own, so bodies are never spliced into one document.
+_log_entry_validator = TypeAdapter(LogEntryPayload)
+_log_entries_validator = TypeAdapter(list[Json[LogEntryPayload]])
+
+
+def encode_log_entry(log_entry: LogEntrySchema) -> str:
+    """Serialize a log entry into a queue message body, leaving out the attributes when unset."""
+    return codec.dumps(log_entry.model_dump(exclude_none=True))
+
+
+def decode_log_entries(bodies: list[str]) -> tuple[list[tuple[int, LogEntryPayload]], list[tuple[int, str]]]:
+    """
+    Decode and validate a batch of queue message bodies.
+
+    Returns the valid entries and the errors of the invalid ones, each paired with the
+    position of its body in `bodies`. The whole batch is first validated in a single call,
+    each body being parsed as a separate JSON document; only when that fails are the
+    bodies checked one by one to split the invalid ones out.
+    """
+    if not bodies:
+        return [], []
+
+    try:
+        return list(enumerate(_log_entries_validator.validate_python(bodies))), []
+    except ValidationError:
+        pass
+
+    valid, invalid = [], []
+    for index, body in enumerate(bodies):
+        try:
+            valid.append((index, _log_entry_validator.validate_json(body)))
+        except ValidationError as exc:
+            invalid.append((index, str(exc)))
+    return valid, invalid
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import field_validator
 from pydantic_settings import BaseSettings
@@ -12,7 +12,95 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "postgres"
 
     QUEUE_URL: str = ""
+    # Number of concurrent SQS requests (threads and pooled HTTP connections) per API process
+    SQS_MAX_CONNECTIONS: int = 50
+    # Opt-in coalescing of concurrent POST /logs enqueues into SendMessageBatch calls
+    SQS_COALESCE_ENABLED: bool = False
+    SQS_COALESCE_MAX_BATCH_SIZE: int = 10
+    SQS_COALESCE_LINGER_MS: float = 5.0
+    SQS_COALESCE_MAX_PENDING: int = 1000
+    # Retries of the API's SQS sends: botocore makes a single attempt bounded by the timeouts,
+    # and throttled or failed sends are retried up to SQS_MAX_ATTEMPTS times with jittered
+    # exponential backoff, within the time left of the Lambda invocation
+    SQS_MAX_ATTEMPTS: int = 4
+    SQS_RETRY_BASE_DELAY_MS: float = 50.0
+    SQS_RETRY_MAX_DELAY_MS: float = 1000.0
+    SQS_CONNECT_TIMEOUT_SECONDS: float = 1.0
+    SQS_READ_TIMEOUT_SECONDS: float = 3.0
+    # After SQS_BREAKER_FAILURE_THRESHOLD consecutive failed attempts, sends fail fast with a
+    # 503 for SQS_BREAKER_RESET_SECONDS, after which a single probe decides whether to resume
+    SQS_BREAKER_FAILURE_THRESHOLD: int = 5
+    SQS_BREAKER_RESET_SECONDS: float = 10.0
+    # Pack POST /logs/batch entries into compressed multi-entry envelope messages
+    SQS_ENVELOPE_ENABLED: bool = False
     SQLALCHEMY_ASYNC_DATABASE_URI: str = ""
+    # Synchronous URI, used by migrations and maintenance commands
+    SQLALCHEMY_DATABASE_URI: str = ""
+
+    # Connection pool settings. Every Lambda container handles one invocation at a time,
+    # so a small pool that is reused across warm invocations keeps the total number of
+    # connections (containers x pool size) within the database's max_connections.
+    DB_POOL_SIZE: int = 1
+    DB_MAX_OVERFLOW: int = 1
+    DB_POOL_TIMEOUT: float = 10.0
+    # Seconds after which a pooled connection is replaced, so frozen containers do not
+    # keep connections the server or a NAT gateway has already dropped
+    DB_POOL_RECYCLE: int = 300
+    DB_POOL_PRE_PING: bool = True
+    # Disable pooling entirely when a proxy such as RDS Proxy pools connections
+    DB_USE_NULL_POOL: bool = False
+    # Seconds to wait for a new connection to be established
+    DB_CONNECT_TIMEOUT: float = 5.0
+
+    # Range partitioning of log_entries on timestamp: partition span, how many days of
+    # partitions to create ahead of time, and after how many days partitions are dropped
+    LOG_PARTITION_INTERVAL: Literal["day", "week"] = "day"
+    LOG_PARTITIONS_AHEAD: int = 7
+    LOG_RETENTION_DAYS: int = 30
+
+    # JSON implementation used for queue payloads and structured output ("orjson" or "json")
+    JSON_CODEC: Literal["orjson", "json"] = "orjson"
+
+    # How the worker writes log entries: one INSERT ... ON CONFLICT statement per batch,
+    # or a COPY into a staging table merged with INSERT ... ON CONFLICT
+    WORKER_WRITE_MODE: Literal["insert", "copy"] = "insert"
+    # Number of sub-batches of a single event written concurrently, each in its own
+    # transaction over its own connection (DB_POOL_SIZE + DB_MAX_OVERFLOW should allow it;
+    # python -m worker grows DB_POOL_SIZE to fit all of its concurrent batches)
+    WORKER_WRITE_CONCURRENCY: int = 2
+    # Bounds of the number of records written per transaction, which grows while sub-batches
+    # commit within WORKER_SUB_BATCH_TARGET_MS and halves when one takes longer or fails
+    WORKER_SUB_BATCH_SIZE_FLOOR: int = 10
+    WORKER_SUB_BATCH_SIZE_CEILING: int = 1000
+    WORKER_SUB_BATCH_TARGET_MS: float = 250.0
+
+    # Long-running worker (python -m worker): number of concurrent long-poll receivers and
+    # of concurrent batches, each writing over up to WORKER_WRITE_CONCURRENCY connections,
+    # how many received messages may wait for processing, the most messages handed to one
+    # batch, the long-poll wait and the delay before a failed message is redelivered
+    WORKER_CONCURRENCY: int = 4
+    WORKER_PREFETCH: int = 100
+    WORKER_BATCH_SIZE: int = 100
+    WORKER_WAIT_TIME_SECONDS: int = 20
+    WORKER_RETRY_DELAY_SECONDS: int = 10
+
+    # In-process cache of recently committed event IDs, kept across warm invocations, which
+    # lets redelivered messages skip the database. A size of 0 disables it.
+    WORKER_DEDUPE_CACHE_SIZE: int = 50_000
+    WORKER_DEDUPE_CACHE_TTL_SECONDS: float = 900.0
+
+    # In-process cache of serialized GET /logs pages, keyed by the query parameters and
+    # the newest log entry id, kept across warm invocations. A size of 0 disables it.
+    LOGS_CACHE_MAX_ENTRIES: int = 256
+    LOGS_CACHE_TTL_SECONDS: float = 2.0
+
+    # Metrics are printed in CloudWatch Embedded Metric Format under METRICS_NAMESPACE in
+    # Lambda and served in the Prometheus format, prefixed with METRICS_PREFIX, on the
+    # API's /metrics and on WORKER_METRICS_PORT of the long-running worker (0 disables it)
+    METRICS_ENABLED: bool = True
+    METRICS_NAMESPACE: str = "FastLogQueue"
+    METRICS_PREFIX: str = "fastlogqueue"
+    WORKER_METRICS_PORT: int = 9100
 
     @field_validator("SQLALCHEMY_ASYNC_DATABASE_URI", mode="after")
     @classmethod
@@ -22,5 +110,13 @@ class Settings(BaseSettings):
 
         return f"postgresql+asyncpg://{info.data['POSTGRES_USER']}:{info.data['POSTGRES_PASSWORD']}@{info.data['POSTGRES_SERVER']}/{info.data['POSTGRES_DB']}"
 
+    @field_validator("SQLALCHEMY_DATABASE_URI", mode="after")
+    @classmethod
+    def assemble_sync_db_connection(cls, v: Optional[str], info) -> str:
+        if v and isinstance(v, str):
+            return v
+
+        return f"postgresql://{info.data['POSTGRES_USER']}:{info.data['POSTGRES_PASSWORD']}@{info.data['POSTGRES_SERVER']}:{info.data['POSTGRES_PORT']}/{info.data['POSTGRES_DB']}"
+
 
 settings = Settings()
@@ -0,0 +1,90 @@
+"""
+Packed multi-entry SQS message envelope.
+
+An envelope carries many log entries in a single SQS message. Its body is a header line
+naming the format version and encoding, followed by the base64 encoded, gzip compressed
+NDJSON of the entries (one queue message body per line):
+
+    FLQ/1 ndjson+gzip
+    H4sIAAAAAAAAA6tWyk0tLk5MT1WyUsrIVNJRykktS80Bcjz93PyVagFcrIqkHwAAAA==
+
+Unpacked entries get stable event IDs derived from the SQS message ID and the position of
+the entry in the envelope, so a redelivered envelope deduplicates entry by entry.
+"""
+
+import base64
+import gzip
+
+ENVELOPE_VERSION = 1
+ENVELOPE_ENCODING = "ndjson+gzip"
+ENVELOPE_HEADER = f"FLQ/{ENVELOPE_VERSION} {ENVELOPE_ENCODING}\n"
+ENVELOPE_MAGIC = "FLQ/"
+
+# SQS rejects message bodies larger than 256 KiB
+MAX_MESSAGE_SIZE = 256 * 1024
+# Uncompressed bytes packed into one envelope before it is compressed; envelopes that
+# still exceed MAX_MESSAGE_SIZE once compressed are split in half
+MAX_RAW_ENVELOPE_SIZE = 2 * 1024 * 1024
+
+
+class InvalidEnvelopeError(ValueError):
+    """Raised when a message body looks like an envelope but cannot be unpacked."""
+
+
+def is_envelope(body: str) -> bool:
+    """Return whether the message body is a packed envelope."""
+    return body.startswith(ENVELOPE_MAGIC)
+
+
+def encode_envelope(bodies: list[str]) -> str:
+    """Pack the given entry bodies into a single envelope body."""
+    payload = "\n".join(bodies).encode()
+    return ENVELOPE_HEADER + base64.b64encode(gzip.compress(payload, compresslevel=6, mtime=0)).decode()
+
+
+def pack_envelopes(bodies: list[str], max_size: int = MAX_MESSAGE_SIZE) -> list[list[str]]:
+    """
+    Group entry bodies into envelopes that each fit into one SQS message.
+
+    Returns the groups of bodies, in order; pass each group to `encode_envelope`.
+    """
+    groups, group, group_size = [], [], 0
+    for body in bodies:
+        if "\n" in body:
+            raise ValueError("Envelope entries must not contain raw newlines")
+        if group and group_size + len(body) + 1 > MAX_RAW_ENVELOPE_SIZE:
+            groups.append(group)
+            group, group_size = [], 0
+        group.append(body)
+        group_size += len(body) + 1
+    if group:
+        groups.append(group)
+
+    packed = []
+    while groups:
+        group = groups.pop(0)
+        if len(group) > 1 and len(encode_envelope(group)) > max_size:
+            middle = len(group) // 2
+            groups[:0] = [group[:middle], group[middle:]]
+            continue
+        packed.append(group)
+    return packed
+
+
+def decode_envelope(body: str) -> list[str]:
+    """Unpack an envelope body into the bodies of its entries."""
+    header, _, data = body.partition("\n")
+    if header != ENVELOPE_HEADER.rstrip("\n"):
+        raise InvalidEnvelopeError(f"Unsupported envelope header: {header[:64]!r}")
+
+    try:
+        payload = gzip.decompress(base64.b64decode(data, validate=True)).decode()
+    except (ValueError, OSError, EOFError) as exc:
+        raise InvalidEnvelopeError(f"Corrupt envelope payload: {exc}") from exc
+
+    return payload.split("\n") if payload else []
+
+
+def envelope_event_id(message_id: str, index: int) -> str:
+    """Return the stable event ID of the entry at `index` in the envelope sent as `message_id`."""
+    return f"{message_id}:{index}"
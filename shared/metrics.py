@@ -0,0 +1,215 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Iterator
+
+from shared.codec import codec
+from shared.config import settings
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Upper bounds, in milliseconds, of the histogram buckets timings are counted in
+TIMING_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# CloudWatch accepts at most 100 values per metric in an Embedded Metric Format document
+EMF_MAX_VALUES = 100
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_prometheus_name_pattern = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def running_in_lambda() -> bool:
+    """Return whether the process runs in AWS Lambda, where metrics are exported as EMF log lines."""
+    return "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+
+class Metrics:
+    """
+    In-process registry of counters, gauges and timing summaries.
+
+    Timings keep a running count, sum, maximum and histogram bucket counts per name
+    instead of raw samples, so memory stays constant for long-lived processes and warm
+    Lambda containers. Only the first EMF_MAX_VALUES samples since the last `reset` are
+    kept, for the Embedded Metric Format output. When disabled, recording is a no-op.
+
+    Recording and reading hold a lock, since the Prometheus endpoint is served from its
+    own threads while the event loop and the thread pools keep recording.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.counters: dict[str, float] = defaultdict(float)
+        self.gauges: dict[str, float] = {}
+        self.timings: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increment the counter `name` by `value`."""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        """Set the gauge `name` to its current `value`."""
+        if self.enabled:
+            with self._lock:
+                self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one sample for the timing `name`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            summary = self.timings.get(name)
+            if summary is None:
+                summary = self.timings[name] = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": 0.0,
+                    "buckets": [0] * len(TIMING_BUCKETS_MS),
+                    "samples": [],
+                }
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+            for index, upper_bound in enumerate(TIMING_BUCKETS_MS):
+                if value <= upper_bound:
+                    summary["buckets"][index] += 1
+                    break
+            if len(summary["samples"]) < EMF_MAX_VALUES:
+                summary["samples"].append(value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Record the duration of the wrapped block, in milliseconds, as a sample of `name`."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self) -> dict[str, dict]:
+        """Return a copy of the current counters, gauges and timings."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings": {
+                    name: {key: summary[key] for key in ("count", "sum", "max")}
+                    for name, summary in self.timings.items()
+                },
+            }
+
+    def reset(self) -> None:
+        """Drop all recorded values."""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.timings.clear()
+
+    def to_emf(self, namespace: str, dimensions: dict[str, str]) -> dict[str, Any]:
+        """
+        Render the recorded values as a CloudWatch Embedded Metric Format document.
+
+        Printed as a single log line in Lambda, the document is turned into metrics by
+        CloudWatch without any API call. Counters are reported as counts, gauges as their
+        last value and timings as their samples in milliseconds.
+        """
+        document: dict[str, Any] = dict(dimensions)
+        definitions = []
+        with self._lock:
+            for name, value in self.counters.items():
+                definitions.append({"Name": name, "Unit": "Count"})
+                document[name] = value
+            for name, value in self.gauges.items():
+                definitions.append({"Name": name, "Unit": "None"})
+                document[name] = value
+            for name, summary in self.timings.items():
+                definitions.append({"Name": name, "Unit": "Milliseconds"})
+                document[name] = list(summary["samples"])
+
+        document["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{"Namespace": namespace, "Dimensions": [list(dimensions)], "Metrics": definitions}],
+        }
+        return document
+
+    def to_prometheus(self, prefix: str) -> str:
+        """Render the recorded values in the Prometheus text exposition format."""
+        # Copy the values under the lock and render them outside of it
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            timings = sorted(
+                (name, summary | {"buckets": list(summary["buckets"])}) for name, summary in self.timings.items()
+            )
+
+        lines = []
+        for name, value in counters:
+            metric = _prometheus_name(prefix, name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, value in gauges:
+            metric = _prometheus_name(prefix, name)
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        for name, summary in timings:
+            metric = _prometheus_name(prefix, name)
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for upper_bound, count in zip(TIMING_BUCKETS_MS, summary["buckets"]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{upper_bound}"}} {cumulative}')
+            lines += [
+                f'{metric}_bucket{{le="+Inf"}} {summary["count"]}',
+                f"{metric}_sum {summary['sum']}",
+                f"{metric}_count {summary['count']}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_name(prefix: str, name: str) -> str:
+    return _prometheus_name_pattern.sub("_", f"{prefix}_{name}")
+
+
+def start_metrics_server(registry: Metrics, port: int, prefix: str) -> "ThreadingHTTPServer":
+    """Serve `registry` in the Prometheus format on http://0.0.0.0:`port`/metrics from a daemon thread."""
+    # Only long-running processes serve metrics, so Lambda functions do not import the server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.to_prometheus(prefix).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Serving Prometheus metrics on port {port}")
+    return server
+
+
+def emit_emf(registry: Metrics, service: str) -> None:
+    """Print the values recorded since the last call as an EMF log line and reset `registry`."""
+    if registry.enabled and (registry.counters or registry.gauges or registry.timings):
+        print(codec.dumps(registry.to_emf(settings.METRICS_NAMESPACE, {"Service": service})), flush=True)
+    registry.reset()
+
+
+metrics = Metrics(enabled=settings.METRICS_ENABLED)
@@ -1,4 +1,6 @@
 from .base_class import Base
+from .log_entries_version import LogEntriesVersion
 from .log_entry import LogEntry
+from .log_rollup import LogRollup
 
-__all__ = ["Base", "LogEntry"]
+__all__ = ["Base", "LogEntriesVersion", "LogEntry", "LogRollup"]
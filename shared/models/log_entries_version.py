@@ -0,0 +1,28 @@
+from sqlalchemy import BigInteger, CheckConstraint, Column, SmallInteger
+from sqlalchemy.dialects.postgresql import insert
+
+from .base_class import Base
+
+
+class LogEntriesVersion(Base):
+    """
+    Single-row counter bumped by every transaction that changes the stored log entries.
+
+    GET /logs derives its ETag from it: unlike the newest entry id, it also changes when
+    entries are committed out of id order or removed with an expired partition.
+    """
+
+    __tablename__ = "log_entries_version"
+    __table_args__ = (CheckConstraint("id = 1", name="ck_log_entries_version_single_row"),)
+
+    id = Column(SmallInteger, primary_key=True, default=1)
+    version = Column(BigInteger, nullable=False)
+
+
+_insert_version = insert(LogEntriesVersion).values(id=1, version=1)
+
+# Locks the row until the transaction ends, so it is run right before the commit
+BUMP_LOG_ENTRIES_VERSION = _insert_version.on_conflict_do_update(
+    index_elements=[LogEntriesVersion.__table__.c.id],
+    set_={"version": LogEntriesVersion.__table__.c.version + 1},
+)
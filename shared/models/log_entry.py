@@ -1,15 +1,76 @@
-from datetime import datetime
-
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import (
+    Column,
+    Computed,
+    DateTime,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+    TypeDecorator,
+    UniqueConstraint,
+    func,
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred
 
 from .base_class import Base
 
+# Text search configuration of the message search vector. "simple" lowercases words
+# without stemming them, which suits log messages full of identifiers and codes.
+TEXT_SEARCH_CONFIG = "simple"
+
+# Log levels are stored as their numeric value from the logging module
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+LOG_LEVEL_NAMES = {value: name for name, value in LOG_LEVELS.items()}
+
+
+class LogLevelType(TypeDecorator):
+    """Stores log level names as a SMALLINT, exposing them as names to the application."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return LOG_LEVELS[value] if isinstance(value, str) else value
+
+    def process_result_value(self, value, dialect):
+        return LOG_LEVEL_NAMES.get(value) if value is not None else None
+
 
 class LogEntry(Base):
     __tablename__ = "log_entries"
 
-    id = Column(Integer, primary_key=True, index=True)
-    event_id = Column(String, unique=True, index=True)
-    message = Column(String, index=True)
-    level = Column(String, index=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    # The table is range partitioned on timestamp, which therefore has to be part of the
+    # primary key and of every unique constraint (see shared.models.partitions)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_id = Column(String)
+    message = Column(String)
+    level = Column(LogLevelType)
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    # Optional flat key-value pairs; NULL rather than an empty object when there are none
+    attributes = Column(JSONB)
+    # Maintained by Postgres; deferred so regular queries do not load it
+    message_tsv = deferred(
+        Column(TSVECTOR, Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(message, ''))", persisted=True))
+    )
+
+    __table_args__ = (
+        UniqueConstraint("event_id", "timestamp", name="uq_log_entries_event_id_timestamp"),
+        # Serves the newest-first keyset pagination on (timestamp, id)
+        Index("ix_log_entries_timestamp_id", "timestamp", "id"),
+        # Rows arrive in timestamp order, so a BRIN index serves time range scans at a
+        # fraction of the size and write cost of a B-tree
+        Index("ix_log_entries_timestamp_brin", "timestamp", postgresql_using="brin"),
+        # Serves GET /logs/search; the optional trigram index for substring search on
+        # message is created by the migration when pg_trgm is available
+        Index("ix_log_entries_message_tsv", "message_tsv", postgresql_using="gin"),
+        # Serves the attribute filters, which are containment (@>) queries; jsonb_path_ops
+        # only supports those but is smaller and faster than the default operator class
+        Index(
+            "ix_log_entries_attributes",
+            "attributes",
+            postgresql_using="gin",
+            postgresql_ops={"attributes": "jsonb_path_ops"},
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy import BigInteger, Column, DateTime
+
+from .base_class import Base
+from .log_entry import LogLevelType
+
+# Width of the rollup buckets; coarser intervals are summed from them at query time
+ROLLUP_BUCKET_SECONDS = 60
+
+
+class LogRollup(Base):
+    """Number of log entries stored per level and minute, maintained by the worker."""
+
+    __tablename__ = "log_entry_rollups"
+
+    # Start of the minute, in UTC, the counted entries were logged in
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    level = Column(LogLevelType, primary_key=True)
+    count = Column(BigInteger, nullable=False)
@@ -0,0 +1,175 @@
+"""
+Range partitioning of the `log_entries` table on `timestamp`.
+
+Each partition covers one day or one week (LOG_PARTITION_INTERVAL), starting and ending
+at midnight UTC, and is named after the first day it covers, e.g. `log_entries_p20240601`.
+A DEFAULT partition catches rows outside the created ranges. Partitions are created ahead of time and expired ones are
+dropped whole, which is far cheaper than DELETE and leaves no bloat behind.
+
+Postgres refuses to create a partition while the DEFAULT partition holds rows of its
+range, e.g. when the maintenance job did not run for a few days. The DEFAULT partition is
+then detached while the new partition is created and those rows are moved into it.
+
+Postgres cannot enforce a unique index across partitions unless it includes the
+partition key, so `event_id` is unique together with `timestamp`. The worker derives
+`timestamp` from the SQS SentTimestamp of the message, which is identical on every
+redelivery, so a redelivered message always targets the same partition and the
+(event_id, timestamp) constraint rejects it exactly like a global unique index would.
+"""
+
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import Connection, text
+
+from shared.config import settings
+from shared.models.log_entries_version import BUMP_LOG_ENTRIES_VERSION
+from shared.models.log_rollup import LogRollup
+
+PARENT_TABLE = "log_entries"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_PREFIX = f"{PARENT_TABLE}_p"
+
+_partition_name_pattern = re.compile(rf"^{PARTITION_PREFIX}\d{{8}}$")
+_upper_bound_pattern = re.compile(r"TO \('([^']+)'\)")
+
+_stranded_rows = text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end LIMIT 1")
+
+# Columns that can be copied between partitions, leaving out the generated ones
+_stored_columns = text(
+    "SELECT quote_ident(attname) FROM pg_attribute WHERE attrelid = CAST(:table AS regclass) "
+    "AND attnum > 0 AND NOT attisdropped AND attgenerated = '' ORDER BY attnum"
+)
+
+
+def partition_start(day: date, interval: str) -> date:
+    """Return the first day of the partition containing `day`."""
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def partition_step(interval: str) -> timedelta:
+    """Return the span covered by a single partition."""
+    return timedelta(weeks=1) if interval == "week" else timedelta(days=1)
+
+
+def partition_name(start: date) -> str:
+    """Return the name of the partition starting on `start`."""
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+def create_default_partition(connection: Connection) -> None:
+    """Create the DEFAULT partition catching rows outside every created range."""
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+
+
+def create_partitions(
+    connection: Connection, first_day: date, last_day: date, interval: str | None = None
+) -> list[str]:
+    """Create the partitions covering `first_day` to `last_day` that do not exist yet."""
+    interval = interval or settings.LOG_PARTITION_INTERVAL
+    step = partition_step(interval)
+    existing = set(list_partitions(connection))
+
+    created = []
+    start = partition_start(first_day, interval)
+    while start <= last_day:
+        name = partition_name(start)
+        if name not in existing:
+            bounds = {
+                "start": datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc),
+                "end": datetime.combine(start + step, datetime.min.time(), tzinfo=timezone.utc),
+            }
+            stranded = connection.execute(_stranded_rows, bounds).first() is not None
+            if stranded:
+                logging.warning(f"Moving the rows of {name} out of {DEFAULT_PARTITION}")
+                connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+            connection.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+                    f"FOR VALUES FROM ('{start.isoformat()} 00:00+00') TO ('{(start + step).isoformat()} 00:00+00')"
+                )
+            )
+            if stranded:
+                columns = ", ".join(connection.execute(_stored_columns, {"table": DEFAULT_PARTITION}).scalars())
+                connection.execute(
+                    text(
+                        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                        f"WHERE timestamp >= :start AND timestamp < :end RETURNING {columns}) "
+                        f"INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+                    ),
+                    bounds,
+                )
+                connection.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+            created.append(name)
+        start += step
+    return created
+
+
+def ensure_partitions(connection: Connection, today: date | None = None, ahead: int | None = None) -> list[str]:
+    """Create the partitions for today and the next `ahead` days."""
+    today = today or datetime.now(timezone.utc).date()
+    ahead = settings.LOG_PARTITIONS_AHEAD if ahead is None else ahead
+    created = create_partitions(connection, today, today + timedelta(days=ahead))
+    if created:
+        logging.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+
+def list_partitions(connection: Connection) -> dict[str, datetime]:
+    """Return the range partitions of `log_entries` with their exclusive upper bound in UTC, oldest first."""
+    result = connection.execute(
+        text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+            "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": PARENT_TABLE},
+    )
+    partitions = {}
+    for name, bound in result:
+        upper_bound = _upper_bound_pattern.search(bound or "")
+        if _partition_name_pattern.match(name) and upper_bound:
+            bound_value = datetime.fromisoformat(upper_bound.group(1))
+            if bound_value.tzinfo is None:
+                bound_value = bound_value.replace(tzinfo=timezone.utc)
+            partitions[name] = bound_value.astimezone(timezone.utc)
+    return dict(sorted(partitions.items(), key=lambda item: item[1]))
+
+
+def drop_expired_partitions(
+    connection: Connection, today: date | None = None, retention_days: int | None = None
+) -> list[str]:
+    """
+    Drop the partitions whose whole range is older than the retention period.
+
+    Expired rows of the DEFAULT partition are deleted as well, and so are the expired
+    rollups, so that the stats never count entries that are gone. The version of the log
+    entries is bumped when entries were removed.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    retention_days = settings.LOG_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.combine(today - timedelta(days=retention_days), datetime.min.time(), tzinfo=timezone.utc)
+
+    dropped = []
+    for name, upper_bound in list_partitions(connection).items():
+        if upper_bound <= cutoff:
+            connection.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+
+    if dropped:
+        logging.info(f"Dropped expired partitions: {', '.join(dropped)}")
+
+    deleted = connection.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"), {"cutoff": cutoff}
+    ).rowcount
+    if deleted:
+        logging.info(f"Deleted {deleted} expired rows from {DEFAULT_PARTITION}")
+
+    connection.execute(text(f"DELETE FROM {LogRollup.__tablename__} WHERE bucket < :cutoff"), {"cutoff": cutoff})
+    if dropped or deleted:
+        connection.execute(BUMP_LOG_ENTRIES_VERSION)
+    return dropped
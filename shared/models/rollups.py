@@ -0,0 +1,54 @@
+"""
+Per-level, per-minute counts of the stored log entries (`log_entry_rollups`).
+
+The worker adds the entries it inserts to the rollups in the transaction that inserts
+them (see worker.writer.increment_rollups), so duplicates skipped by the insert are not
+counted and a rolled back batch leaves no trace. Entries stored before the rollups
+existed, or by other means, are counted by rebuilding the rollups of a time range from
+`log_entries`, one day per transaction.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import Connection, text
+
+from shared.models.log_entry import LogEntry
+from shared.models.log_rollup import ROLLUP_BUCKET_SECONDS, LogRollup
+
+ROLLUP_TABLE = LogRollup.__tablename__
+
+_delete_rollups = text(f"DELETE FROM {ROLLUP_TABLE} WHERE bucket >= :start AND bucket < :end")
+
+_count_log_entries = text(
+    f"INSERT INTO {ROLLUP_TABLE} (bucket, level, count) "
+    f"SELECT to_timestamp(floor(extract(epoch FROM timestamp) / {ROLLUP_BUCKET_SECONDS}) * {ROLLUP_BUCKET_SECONDS}), "
+    "level, count(*) "
+    f"FROM {LogEntry.__tablename__} WHERE timestamp >= :start AND timestamp < :end "
+    "GROUP BY 1, level"
+)
+
+
+def stored_days(connection: Connection) -> list[date]:
+    """Return the UTC days from the oldest to the newest stored log entry."""
+    oldest, newest = connection.execute(
+        text(f"SELECT min(timestamp), max(timestamp) FROM {LogEntry.__tablename__}")
+    ).one()
+    if oldest is None:
+        return []
+    first, last = oldest.astimezone(timezone.utc).date(), newest.astimezone(timezone.utc).date()
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def rebuild_rollups(connection: Connection, day: date) -> int:
+    """
+    Replace the rollups of the UTC day `day` with counts of the stored entries.
+
+    The table lock waits for the worker transactions that already updated rollups and
+    holds back new ones until the caller commits, so entries committed concurrently are
+    counted exactly once. Returns the number of rollup rows written.
+    """
+    start = datetime.combine(day, time(), tzinfo=timezone.utc)
+    bounds = {"start": start, "end": start + timedelta(days=1)}
+    connection.execute(text(f"LOCK TABLE {ROLLUP_TABLE} IN SHARE ROW EXCLUSIVE MODE"))
+    connection.execute(_delete_rollups, bounds)
+    return connection.execute(_count_log_entries, bounds).rowcount
@@ -1,6 +1,60 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import functools
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 from shared.config import settings
+from shared.metrics import metrics
+
+
+def create_engine() -> AsyncEngine:
+    """
+    Create the async engine with the pool settings from `shared.config.Settings`.
+
+    The engine is created once per process and reused by warm Lambda invocations. With
+    DB_USE_NULL_POOL the pool is disabled and every session opens its own connection,
+    which suits deployments where a proxy (e.g. RDS Proxy) pools connections instead.
+    """
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {"timeout": settings.DB_CONNECT_TIMEOUT},
+    }
+    if settings.DB_USE_NULL_POOL:
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+
+    engine = create_async_engine(settings.SQLALCHEMY_ASYNC_DATABASE_URI, **options)
+    event.listen(engine.sync_engine, "connect", lambda *args: metrics.incr("db.connections_opened"))
+    event.listen(engine.sync_engine, "checkout", lambda *args: metrics.incr("db.connections_checked_out"))
+    return engine
+
+
+async def acquire_connection(session: AsyncSession) -> AsyncConnection:
+    """Check out the session's connection up front, recording how long acquiring it took."""
+    with metrics.timer("db.connection_acquire_ms"):
+        return await session.connection()
+
+
+@functools.cache
+def get_engine() -> AsyncEngine:
+    """Return the engine of the process, created on first use, which also imports asyncpg."""
+    return create_engine()
+
+
+class LazyAsyncSessionmaker(async_sessionmaker):
+    """Session factory binding its sessions to `get_engine()` once the first one is opened."""
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
 
-engine = create_async_engine(settings.SQLALCHEMY_ASYNC_DATABASE_URI)
-AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+AsyncSessionLocal = LazyAsyncSessionmaker(class_=AsyncSession, expire_on_commit=False)
@@ -0,0 +1,40 @@
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, Field, StringConstraints
+from typing_extensions import NotRequired, TypedDict
+
+LogLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+# Bounds of the structured attributes of a log entry
+MAX_ATTRIBUTES = 32
+MAX_ATTRIBUTE_KEY_LENGTH = 128
+
+AttributeKey = Annotated[str, StringConstraints(min_length=1, max_length=MAX_ATTRIBUTE_KEY_LENGTH)]
+# bool first, so that booleans are kept rather than coerced to numbers; NaN and infinities
+# are rejected, as JSONB cannot store them
+AttributeValue = bool | int | Annotated[float, Field(allow_inf_nan=False)] | str
+
+# Flat key-value pairs such as request IDs, hostnames or tenant IDs, stored in an indexed
+# JSONB column so that entries can be filtered on them without scanning the messages
+Attributes = Annotated[dict[AttributeKey, AttributeValue], Field(max_length=MAX_ATTRIBUTES)]
+
+
+class LogEntrySchema(BaseModel):
+    """Schema for log entry payload."""
+
+    message: str
+    level: LogLevel
+    attributes: Attributes | None = None
+
+
+class LogEntryPayload(TypedDict):
+    """
+    Queue message shape of a log entry.
+
+    Mirrors `LogEntrySchema` as a TypedDict so the worker validates message bodies
+    straight into plain dicts, without building a model instance per record.
+    """
+
+    message: str
+    level: LogLevel
+    attributes: NotRequired[Attributes | None]
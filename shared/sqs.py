@@ -0,0 +1,57 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+
+class AsyncSQSClient:
+    """
+    Non-blocking facade over a boto3 SQS client.
+
+    boto3 calls block on network I/O, so every call is dispatched to a dedicated thread pool
+    instead of running on the event loop. The pool is sized to match the client's HTTP
+    connection pool, which lets up to `max_connections` requests stay in flight at once
+    while reusing keep-alive connections across calls.
+
+    boto3 is imported and the client created by the first call, since both are costly and
+    not every process creating the facade sends messages. `config` holds further botocore
+    client options, such as timeouts and retries.
+    """
+
+    def __init__(self, client: Any = None, max_connections: int = 50, **config: Any):
+        self._client = client
+        self._max_connections = max_connections
+        self._config = config
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="sqs-client")
+
+    @property
+    def client(self) -> Any:
+        """The boto3 SQS client, created on first use."""
+        if self._client is None:
+            import boto3
+            from botocore.config import Config
+
+            self._client = boto3.client(
+                "sqs", config=Config(max_pool_connections=self._max_connections, **self._config)
+            )
+        return self._client
+
+    async def _call(self, operation: str, **kwargs) -> dict[str, Any]:
+        """Run a boto3 SQS operation on the thread pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(getattr(self.client, operation), **kwargs))
+
+    async def send_message(self, **kwargs) -> dict[str, Any]:
+        return await self._call("send_message", **kwargs)
+
+    async def send_message_batch(self, **kwargs) -> dict[str, Any]:
+        return await self._call("send_message_batch", **kwargs)
+
+    async def receive_message(self, **kwargs) -> dict[str, Any]:
+        return await self._call("receive_message", **kwargs)
+
+    async def delete_message_batch(self, **kwargs) -> dict[str, Any]:
+        return await self._call("delete_message_batch", **kwargs)
+
+    async def change_message_visibility_batch(self, **kwargs) -> dict[str, Any]:
+        return await self._call("change_message_visibility_batch", **kwargs)
@@ -0,0 +1,8 @@
+from itertools import islice
+
+
+def batched(iterable, n):
+    """Batch data into chunks of length n. The last batch may be shorter."""
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
@@ -5,6 +5,7 @@ from testcontainers.postgres import PostgresContainer
 
 from shared.config import settings
 from shared.models.base_class import Base
+from shared.models.partitions import create_default_partition
 
 
 @pytest.fixture(scope="session")
@@ -30,7 +31,7 @@ async def async_client(async_app):
 @pytest.fixture(scope="session")
 def test_postgres():
     """Starts and stops the Postgres test container."""
-    test_postgres = PostgresContainer("postgres:9.5")
+    test_postgres = PostgresContainer("postgres:16.3")
     test_postgres.start()
     yield test_postgres
     test_postgres.stop()
@@ -53,7 +54,21 @@ async def async_db(test_postgres, monkeypatch):
     async with async_engine.begin() as connection:
         await connection.run_sync(Base.metadata.drop_all)
         await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(create_default_partition)
         async with async_session(bind=connection) as session:
             yield session
             await session.flush()
             await session.rollback()
+
+
+@pytest.fixture
+def override_get_async_db(async_app, async_db):
+    """Makes the API endpoints use the test database session."""
+    from api.dependencies import get_async_db
+
+    async def get_test_db():
+        yield async_db
+
+    async_app.dependency_overrides[get_async_db] = get_test_db
+    yield async_db
+    async_app.dependency_overrides.pop(get_async_db, None)
@@ -0,0 +1,23 @@
+from worker.adaptive import AdaptiveBatchSize
+
+
+def test_adaptive_batch_size_grows_additively_and_shrinks_multiplicatively():
+    size = AdaptiveBatchSize(initial=100, floor=10, ceiling=130, target_ms=50, increase=20)
+
+    assert size.update(100, duration_ms=10) == 120
+    assert size.update(120, duration_ms=10) == 130
+    assert size.update(130, duration_ms=80) == 65
+    assert size.update(65, duration_ms=10, failed=True) == 32
+    assert size.update(32, duration_ms=80) == 16
+    assert size.update(16, duration_ms=80) == 10
+
+
+def test_adaptive_batch_size_ignores_stale_slowdowns_and_partial_sub_batches():
+    size = AdaptiveBatchSize(initial=100, floor=10, ceiling=1000, target_ms=50)
+
+    assert size.update(100, duration_ms=80) == 50
+    # Another sub-batch cut at 100 before the reduction reports the same slowdown
+    assert size.update(100, duration_ms=80) == 50
+    assert size.update(50, duration_ms=80) == 25
+    # The tail of an event says nothing about whether a full sub-batch would be fast
+    assert size.update(25, duration_ms=1, full=False) == 25
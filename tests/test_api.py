@@ -1,12 +1,16 @@
+import asyncio
+import csv
+import io
 import json
 from http import HTTPStatus
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import boto3
 import pytest
 from botocore.exceptions import ClientError
 from moto import mock_aws
 
+from api.sqs_resilience import CircuitBreaker, ResilientSQSClient
 from shared.config import settings
 
 pytestmark = pytest.mark.anyio
@@ -43,6 +47,25 @@ async def test_logs_endpoint_successfully_queues_log_entry(async_client, sqs_cli
     assert body == payload
 
 
+async def test_logs_endpoint_queues_attributes(async_client, sqs_client):
+    payload = {"message": "Payment declined", "level": "ERROR", "attributes": {"service": "checkout", "status": 402}}
+    url = async_client._transport.app.url_path_for("logs")
+
+    resp = await async_client.post(url, json=payload)
+    nested = await async_client.post(url, json=payload | {"attributes": {"request": {"id": "abc"}}})
+    not_a_number = await async_client.post(
+        url,
+        content='{"message": "m", "level": "ERROR", "attributes": {"latency": NaN}}',
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert resp.status_code == HTTPStatus.OK
+    messages = sqs_client.receive_message(QueueUrl=settings.QUEUE_URL, MaxNumberOfMessages=1)
+    assert json.loads(messages["Messages"][0]["Body"]) == payload
+    assert nested.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert not_a_number.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
 async def test_logs_endpoint_handles_sqs_client_error(async_client, monkeypatch):
     with patch("api.main.sqs") as mock_sqs_client:
         mock_sqs_client.send_message.side_effect = ClientError({"Error": {"Message": "Test error"}}, "SendMessage")
@@ -55,6 +78,23 @@ async def test_logs_endpoint_handles_sqs_client_error(async_client, monkeypatch)
         }
 
 
+async def test_logs_endpoints_fail_fast_with_retry_after_while_sqs_is_down(async_client):
+    send_message = AsyncMock(side_effect=ClientError({"Error": {"Code": "ServiceUnavailable"}}, "SendMessage"))
+    unavailable_sqs = AsyncMock(send_message=send_message, send_message_batch=send_message)
+    sqs = ResilientSQSClient(unavailable_sqs, CircuitBreaker(failure_threshold=2, reset_timeout=30), max_attempts=3)
+    payload = {"message": "Test log entry", "level": "INFO"}
+
+    with patch("api.main.sqs", sqs):
+        first = await async_client.post(async_client._transport.app.url_path_for("logs"), json=payload)
+        second = await async_client.post(async_client._transport.app.url_path_for("logs"), json=payload)
+        batch = await async_client.post(async_client._transport.app.url_path_for("logs_batch"), json=[payload])
+
+    assert send_message.await_count == 2
+    for resp in (first, second, batch):
+        assert resp.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert 1 <= int(resp.headers["Retry-After"]) <= 30
+
+
 async def test_logs_endpoint_validates_log_level(async_client):
     payload = {"message": "Test log entry", "level": "INVALID"}
 
@@ -62,3 +102,340 @@ async def test_logs_endpoint_validates_log_level(async_client):
     resp = await async_client.post(url, json=payload)
 
     assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_logs_batch_endpoint_queues_entries_in_groups(async_client, sqs_client):
+    payload = [{"message": f"Test log entry {index}", "level": "INFO"} for index in range(25)]
+
+    url = async_client._transport.app.url_path_for("logs_batch")
+    with patch("api.main.sqs.send_message_batch", wraps=sqs_client.send_message_batch) as send_message_batch:
+        resp = await async_client.post(url, json=payload)
+
+    assert resp.status_code == HTTPStatus.OK
+    body = resp.json()
+    assert body["queued"] == 25
+    assert body["failed"] == 0
+    assert [result["index"] for result in body["results"]] == list(range(25))
+    assert [len(call.kwargs["Entries"]) for call in send_message_batch.call_args_list] == [10, 10, 5]
+
+    queue_attributes = sqs_client.get_queue_attributes(
+        QueueUrl=settings.QUEUE_URL, AttributeNames=["ApproximateNumberOfMessages"]
+    )
+    assert queue_attributes["Attributes"]["ApproximateNumberOfMessages"] == "25"
+
+
+async def test_logs_batch_endpoint_reports_failed_entries(async_client):
+    with patch("api.main.sqs") as mock_sqs_client:
+        mock_sqs_client.send_message_batch = AsyncMock()
+        mock_sqs_client.send_message_batch.return_value = {
+            "Successful": [{"Id": "0"}],
+            "Failed": [{"Id": "1", "SenderFault": False, "Code": "InternalError", "Message": "Test error"}],
+        }
+        payload = [{"message": "Test log entry 1", "level": "INFO"}, {"message": "Test log entry 2", "level": "ERROR"}]
+        url = async_client._transport.app.url_path_for("logs_batch")
+        resp = await async_client.post(url, json=payload)
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == {
+        "queued": 1,
+        "failed": 1,
+        "results": [{"index": 0, "status": "queued"}, {"index": 1, "status": "failed", "error": "Test error"}],
+    }
+
+
+async def test_logs_batch_endpoint_validates_every_entry(async_client):
+    payload = [{"message": "Test log entry", "level": "INFO"}, {"message": "Test log entry", "level": "INVALID"}]
+
+    url = async_client._transport.app.url_path_for("logs_batch")
+    resp = await async_client.post(url, json=payload)
+
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_logs_endpoint_coalesces_concurrent_entries(async_client, sqs_client, monkeypatch):
+    monkeypatch.setattr(settings, "SQS_COALESCE_ENABLED", True)
+    payload = {"message": "Test log entry", "level": "INFO"}
+
+    url = async_client._transport.app.url_path_for("logs")
+    with patch("api.main.sqs.send_message_batch", wraps=sqs_client.send_message_batch) as send_message_batch:
+        responses = await asyncio.gather(*(async_client.post(url, json=payload) for _ in range(12)))
+
+    assert all(resp.status_code == HTTPStatus.OK for resp in responses)
+    assert sorted(len(call.kwargs["Entries"]) for call in send_message_batch.call_args_list) == [2, 10]
+
+
+async def test_logs_batch_endpoint_packs_entries_into_envelopes(async_client, sqs_client, monkeypatch):
+    from shared.envelope import decode_envelope
+
+    monkeypatch.setattr(settings, "SQS_ENVELOPE_ENABLED", True)
+    payload = [{"message": f"Test log entry {index}", "level": "INFO"} for index in range(25)]
+
+    url = async_client._transport.app.url_path_for("logs_batch")
+    resp = await async_client.post(url, json=payload)
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json()["queued"] == 25
+
+    messages = sqs_client.receive_message(QueueUrl=settings.QUEUE_URL, MaxNumberOfMessages=10)
+    assert len(messages["Messages"]) == 1
+    assert [json.loads(body) for body in decode_envelope(messages["Messages"][0]["Body"])] == payload
+
+
+@pytest.fixture
+async def log_entries(override_get_async_db):
+    from datetime import datetime, timedelta, timezone
+
+    from shared.models.log_entry import LogEntry
+
+    started = datetime(2024, 6, 1, 12, 0, 0, tzinfo=timezone.utc)
+    entries = [
+        LogEntry(
+            event_id=f"event-{index}",
+            message=f"Test log entry {index}",
+            level="ERROR" if index % 3 == 0 else "INFO",
+            timestamp=started + timedelta(seconds=index // 2),
+        )
+        for index in range(12)
+    ]
+    override_get_async_db.add_all(entries)
+    await override_get_async_db.flush()
+    return entries
+
+
+async def test_get_logs_paginates_with_cursor(async_client, log_entries):
+    url = async_client._transport.app.url_path_for("get_logs")
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 5} | ({"cursor": cursor} if cursor else {})
+        resp = await async_client.get(url, params=params)
+        assert resp.status_code == HTTPStatus.OK
+        pages.append([log["event_id"] for log in resp.json()])
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    expected = [entry.event_id for entry in sorted(log_entries, key=lambda e: (e.timestamp, e.id), reverse=True)]
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert [event_id for page in pages for event_id in page] == expected
+
+
+async def test_get_logs_filters_by_level_and_time_range(async_client, log_entries):
+    url = async_client._transport.app.url_path_for("get_logs")
+    params = {"level": "ERROR", "since": "2024-06-01T12:00:01", "until": "2024-06-01T12:00:05", "limit": 100}
+
+    resp = await async_client.get(url, params=params)
+
+    assert resp.status_code == HTTPStatus.OK
+    assert [log["event_id"] for log in resp.json()] == ["event-9", "event-6", "event-3"]
+    assert "X-Next-Cursor" not in resp.headers
+
+
+async def test_get_logs_rejects_invalid_cursor(async_client, override_get_async_db):
+    url = async_client._transport.app.url_path_for("get_logs")
+
+    resp = await async_client.get(url, params={"cursor": "not-a-cursor"})
+
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+async def test_get_logs_returns_not_modified_until_the_version_is_bumped(
+    async_client, log_entries, override_get_async_db
+):
+    from shared.models.log_entries_version import BUMP_LOG_ENTRIES_VERSION
+    from shared.models.log_entry import LogEntry
+
+    url = async_client._transport.app.url_path_for("get_logs")
+    resp = await async_client.get(url, params={"limit": 5})
+    etag = resp.headers["ETag"]
+    assert resp.headers["Cache-Control"] == "no-cache"
+
+    resp = await async_client.get(url, params={"limit": 5}, headers={"If-None-Match": etag})
+    assert resp.status_code == HTTPStatus.NOT_MODIFIED
+    assert resp.content == b""
+
+    resp = await async_client.get(url, params={"limit": 6}, headers={"If-None-Match": etag})
+    assert resp.status_code == HTTPStatus.OK
+
+    override_get_async_db.add(LogEntry(event_id="event-new", message="New entry", level="INFO"))
+    await override_get_async_db.execute(BUMP_LOG_ENTRIES_VERSION)
+    resp = await async_client.get(url, params={"limit": 5}, headers={"If-None-Match": etag})
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["ETag"] != etag
+    assert resp.json()[0]["event_id"] == "event-new"
+
+
+async def test_get_logs_serves_repeated_pages_from_cache(async_client, log_entries):
+    from api.main import logs_cache
+    from shared.metrics import metrics
+
+    logs_cache.clear()
+    metrics.reset()
+    url = async_client._transport.app.url_path_for("get_logs")
+
+    first = await async_client.get(url, params={"limit": 5})
+    second = await async_client.get(url, params={"limit": 5})
+
+    assert second.json() == first.json()
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert metrics.snapshot()["counters"] == {"api.logs_cache_misses": 1, "api.logs_cache_hits": 1}
+
+
+async def test_export_logs_streams_ndjson_oldest_first(async_client, log_entries, override_get_async_db):
+    url = async_client._transport.app.url_path_for("export_logs")
+
+    with patch("api.export.AsyncSessionLocal", return_value=override_get_async_db):
+        resp = await async_client.get(url, params={"level": "ERROR"})
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in resp.text.splitlines()]
+    assert [log["event_id"] for log in exported] == ["event-0", "event-3", "event-6", "event-9"]
+    assert exported[0]["level"] == "ERROR"
+
+
+async def test_export_logs_streams_csv_with_header(async_client, log_entries, override_get_async_db):
+    url = async_client._transport.app.url_path_for("export_logs")
+
+    with patch("api.export.AsyncSessionLocal", return_value=override_get_async_db):
+        resp = await async_client.get(url, params={"format": "csv", "limit": 3})
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0] == ["id", "event_id", "message", "level", "timestamp", "attributes"]
+    assert [row[1] for row in rows[1:]] == ["event-0", "event-1", "event-2"]
+
+
+async def test_get_logs_filters_on_attributes(async_client, override_get_async_db):
+    from shared.models.log_entry import LogEntry
+
+    override_get_async_db.add_all(
+        [
+            LogEntry(
+                event_id="checkout", message="m", level="ERROR", attributes={"service": "checkout", "status": 500}
+            ),
+            LogEntry(
+                event_id="checkout-ok", message="m", level="INFO", attributes={"service": "checkout", "status": "ok"}
+            ),
+            LogEntry(event_id="billing", message="m", level="ERROR", attributes={"service": "billing", "status": 500}),
+            LogEntry(event_id="none", message="m", level="ERROR"),
+        ]
+    )
+    await override_get_async_db.flush()
+    url = async_client._transport.app.url_path_for("get_logs")
+
+    async def event_ids(params):
+        resp = await async_client.get(url, params=params | {"limit": 10})
+        assert resp.status_code == HTTPStatus.OK
+        return sorted(log["event_id"] for log in resp.json())
+
+    assert await event_ids({"attr.service": "checkout"}) == ["checkout", "checkout-ok"]
+    assert await event_ids({"attr.service": "checkout", "attr.status": "500"}) == ["checkout"]
+    assert await event_ids({"attr.service": ["checkout", "billing"], "level": "ERROR"}) == ["billing", "checkout"]
+    assert await event_ids({"attr.tenant": "acme"}) == []
+
+    resp = await async_client.get(url, params={"attr.status": "ok"})
+    assert resp.json()[0]["attributes"] == {"service": "checkout", "status": "ok"}
+
+    resp = await async_client.get(url, params={"attr.": "empty key"})
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    resp = await async_client.get(async_client._transport.app.url_path_for("get_log_stats"), params={"attr.a": "b"})
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+async def test_get_log_stats_reads_backfilled_rollups(async_client, log_entries, override_get_async_db):
+    from datetime import date, datetime, timezone
+
+    from shared.models.log_entry import LogEntry
+    from shared.models.rollups import rebuild_rollups
+
+    override_get_async_db.add(
+        LogEntry(
+            event_id="event-later",
+            message="m",
+            level="ERROR",
+            timestamp=datetime(2024, 6, 1, 12, 42, 5, tzinfo=timezone.utc),
+        )
+    )
+    await override_get_async_db.flush()
+    written = await override_get_async_db.run_sync(
+        lambda session: rebuild_rollups(session.connection(), date(2024, 6, 1))
+    )
+    url = async_client._transport.app.url_path_for("get_log_stats")
+
+    by_minute = await async_client.get(url, params={"interval": "minute", "level": "ERROR"})
+    by_hour = await async_client.get(url, params={"since": "2024-06-01T12:00:00Z", "until": "2024-06-01T13:00:00Z"})
+
+    assert written == 3
+    assert by_minute.json() == [
+        {"bucket": "2024-06-01T12:00:00+00:00", "level": "ERROR", "count": 4},
+        {"bucket": "2024-06-01T12:42:00+00:00", "level": "ERROR", "count": 1},
+    ]
+    assert by_hour.json() == [
+        {"bucket": "2024-06-01T12:00:00+00:00", "level": "INFO", "count": 8},
+        {"bucket": "2024-06-01T12:00:00+00:00", "level": "ERROR", "count": 5},
+    ]
+
+
+@pytest.fixture
+async def searchable_log_entries(override_get_async_db):
+    from datetime import datetime, timedelta, timezone
+
+    from shared.models.log_entry import LogEntry
+
+    messages = [
+        "Payment declined for order 1001",
+        "Payment accepted for order 1002",
+        "User login failed: invalid password",
+        "Payment declined: card expired, payment retried",
+        "Cache warmed in 120ms",
+    ]
+    entries = [
+        LogEntry(
+            event_id=f"event-{index}",
+            message=message,
+            level="INFO",
+            timestamp=datetime(2024, 6, 1, 12, 0, 0, tzinfo=timezone.utc) + timedelta(seconds=index),
+        )
+        for index, message in enumerate(messages)
+    ]
+    override_get_async_db.add_all(entries)
+    await override_get_async_db.flush()
+    return entries
+
+
+async def test_search_logs_matches_words_newest_first(async_client, searchable_log_entries):
+    url = async_client._transport.app.url_path_for("search_logs")
+
+    resp = await async_client.get(url, params={"q": "payment declined", "limit": 1})
+
+    assert resp.status_code == HTTPStatus.OK
+    assert [log["event_id"] for log in resp.json()] == ["event-3"]
+    assert resp.json()[0]["rank"] > 0
+
+    resp = await async_client.get(url, params={"q": "payment declined", "cursor": resp.headers["X-Next-Cursor"]})
+    assert [log["event_id"] for log in resp.json()] == ["event-0"]
+
+
+async def test_search_logs_orders_by_rank(async_client, searchable_log_entries):
+    url = async_client._transport.app.url_path_for("search_logs")
+
+    resp = await async_client.get(url, params={"q": "payment -accepted", "order": "rank"})
+
+    assert resp.status_code == HTTPStatus.OK
+    assert [log["event_id"] for log in resp.json()] == ["event-3", "event-0"]
+    assert "X-Next-Cursor" not in resp.headers
+
+    resp = await async_client.get(url, params={"q": "payment", "order": "rank", "cursor": "any"})
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+async def test_search_logs_substring_mode(async_client, searchable_log_entries):
+    url = async_client._transport.app.url_path_for("search_logs")
+
+    resp = await async_client.get(url, params={"q": "LOGIN FAIL", "mode": "substring"})
+
+    assert resp.status_code == HTTPStatus.OK
+    assert [log["event_id"] for log in resp.json()] == ["event-2"]
+    assert resp.json()[0]["rank"] is None
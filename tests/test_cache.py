@@ -0,0 +1,35 @@
+from api.cache import ResponseCache, etag_matches, make_etag
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_response_cache_expires_and_evicts_least_recently_used():
+    clock = FakeClock()
+    cache = ResponseCache(max_size=2, ttl=2, clock=clock)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"
+
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+
+    clock.now = 2
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_etag_matches_any_listed_or_weak_tag():
+    etag = make_etag(42, "ERROR", None, 5)
+
+    assert etag == make_etag(42, "ERROR", None, 5)
+    assert etag != make_etag(43, "ERROR", None, 5)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,48 @@
+import json
+
+from shared.codec import JSONCodec, OrjsonCodec, decode_log_entries
+
+
+def test_decode_log_entries_validates_whole_batch():
+    bodies = [json.dumps({"message": f"Test log entry {i}", "level": "INFO"}) for i in range(3)]
+
+    valid, invalid = decode_log_entries(bodies)
+
+    assert valid == [(i, {"message": f"Test log entry {i}", "level": "INFO"}) for i in range(3)]
+    assert invalid == []
+
+
+def test_decode_log_entries_splits_out_invalid_bodies():
+    bodies = [
+        json.dumps({"message": "Test log entry", "level": "INFO"}),
+        "not json",
+        json.dumps({"message": "Test log entry"}),
+        json.dumps({"message": "Test log entry", "level": "INVALID"}),
+        json.dumps({"message": "Test log entry", "level": "ERROR"})
+        + ","
+        + json.dumps({"message": "x", "level": "INFO"}),
+        "",
+        json.dumps({"message": "Test log entry", "level": "ERROR"}),
+    ]
+
+    valid, invalid = decode_log_entries(bodies)
+
+    assert [index for index, _ in valid] == [0, 6]
+    assert [index for index, _ in invalid] == [1, 2, 3, 4, 5]
+
+
+def test_decode_log_entries_does_not_merge_invalid_bodies():
+    # Each body is invalid on its own, but joined with a comma they form two valid entries
+    bodies = ['{"message":"a","level":"INFO"},{"message":"b","level":"INFO"', '"level":"ERROR"}']
+
+    valid, invalid = decode_log_entries(bodies)
+
+    assert valid == []
+    assert [index for index, _ in invalid] == [0, 1]
+
+
+def test_codecs_round_trip():
+    payload = {"message": "Test log entry", "level": "INFO", "count": 1}
+
+    for codec in (JSONCodec, OrjsonCodec):
+        assert codec.loads(codec.dumps(payload)) == payload
@@ -0,0 +1,99 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from shared.config import settings
+from shared.sqs import AsyncSQSClient
+from worker.consumer import SQSConsumer, size_connection_pool
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def sqs_queue():
+    with mock_aws():
+        client = boto3.client("sqs", region_name="us-east-1")
+        queue = client.create_queue(QueueName="test-queue", Attributes={"VisibilityTimeout": "30"})
+        yield client, queue["QueueUrl"]
+
+
+def queued_message_count(client, queue_url: str) -> tuple[int, int]:
+    attributes = client.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"],
+    )["Attributes"]
+    return int(attributes["ApproximateNumberOfMessages"]), int(attributes["ApproximateNumberOfMessagesNotVisible"])
+
+
+async def run_until_drained(consumer: SQSConsumer, expected_calls: int, handle_event):
+    task = asyncio.create_task(consumer.run())
+    for _ in range(200):
+        if handle_event.call_count >= expected_calls and consumer._messages.empty():
+            break
+        await asyncio.sleep(0.01)
+    consumer.stop()
+    await asyncio.wait_for(task, timeout=5)
+
+
+async def test_consumer_deletes_committed_messages(sqs_queue):
+    client, queue_url = sqs_queue
+    for index in range(3):
+        client.send_message(QueueUrl=queue_url, MessageBody=json.dumps({"message": f"entry {index}", "level": "INFO"}))
+    consumer = SQSConsumer(AsyncSQSClient(client=client), queue_url, concurrency=1, wait_time_seconds=0)
+
+    with patch("worker.consumer.handle_event", return_value={"batchItemFailures": []}) as handle_event:
+        await run_until_drained(consumer, 1, handle_event)
+
+    records = [record for call in handle_event.call_args_list for record in call.args[0]["Records"]]
+    assert sorted(json.loads(record["body"])["message"] for record in records) == ["entry 0", "entry 1", "entry 2"]
+    assert all("SentTimestamp" in record["attributes"] for record in records)
+    assert queued_message_count(client, queue_url) == (0, 0)
+
+
+async def test_consumer_keeps_failed_messages_for_redelivery(sqs_queue):
+    client, queue_url = sqs_queue
+    client.send_message(QueueUrl=queue_url, MessageBody=json.dumps({"message": "ok", "level": "INFO"}))
+    client.send_message(QueueUrl=queue_url, MessageBody=json.dumps({"message": "fails", "level": "INFO"}))
+    consumer = SQSConsumer(AsyncSQSClient(client=client), queue_url, concurrency=1, wait_time_seconds=0)
+
+    async def fail_second(event):
+        failed = [record["messageId"] for record in event["Records"] if "fails" in record["body"]]
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed]}
+
+    with patch("worker.consumer.handle_event", side_effect=fail_second) as handle_event:
+        await run_until_drained(consumer, 1, handle_event)
+
+    # The failed message is neither deleted nor immediately visible again
+    assert queued_message_count(client, queue_url) == (0, 1)
+
+
+async def test_consumer_processes_prefetched_messages_on_stop(sqs_queue):
+    client, queue_url = sqs_queue
+    consumer = SQSConsumer(AsyncSQSClient(client=client), queue_url, concurrency=2, wait_time_seconds=0)
+    for index in range(4):
+        client.send_message(QueueUrl=queue_url, MessageBody=str(index))
+    response = client.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=4)
+    for message in response["Messages"]:
+        consumer._messages.put_nowait(message)
+    consumer.stop()
+
+    with patch("worker.consumer.handle_event", return_value={"batchItemFailures": []}) as handle_event:
+        await asyncio.wait_for(consumer.run(), timeout=5)
+
+    assert sum(len(call.args[0]["Records"]) for call in handle_event.call_args_list) == 4
+    assert queued_message_count(client, queue_url) == (0, 0)
+
+
+def test_size_connection_pool_fits_every_concurrent_writer(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(settings, "WORKER_WRITE_CONCURRENCY", 2)
+
+    size_connection_pool(4)
+    assert settings.DB_POOL_SIZE == 8
+
+    size_connection_pool(2)
+    assert settings.DB_POOL_SIZE == 8
@@ -0,0 +1,40 @@
+from worker.dedupe import RecentEventIds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_recent_event_ids_evicts_least_recently_seen():
+    recent = RecentEventIds(max_size=2, ttl=60)
+    recent.add_many(["a", "b"])
+    assert "a" in recent
+
+    recent.add_many(["c"])
+
+    assert "a" in recent
+    assert "b" not in recent
+    assert "c" in recent
+
+
+def test_recent_event_ids_expire_after_ttl():
+    clock = FakeClock()
+    recent = RecentEventIds(max_size=10, ttl=60, clock=clock)
+    recent.add_many(["a"])
+
+    clock.now = 59
+    assert "a" in recent
+    clock.now = 60
+    assert "a" not in recent
+    assert len(recent) == 0
+
+
+def test_recent_event_ids_disabled_with_zero_size():
+    recent = RecentEventIds(max_size=0)
+    recent.add_many(["a"])
+
+    assert "a" not in recent
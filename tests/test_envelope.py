@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from shared.envelope import (
+    InvalidEnvelopeError,
+    decode_envelope,
+    encode_envelope,
+    envelope_event_id,
+    is_envelope,
+    pack_envelopes,
+)
+
+
+def test_envelope_round_trip():
+    bodies = [json.dumps({"message": f"Test log entry {i}", "level": "INFO"}) for i in range(100)]
+
+    envelope = encode_envelope(bodies)
+
+    assert is_envelope(envelope)
+    assert envelope.startswith("FLQ/1 ndjson+gzip\n")
+    assert len(envelope) < len("".join(bodies))
+    assert decode_envelope(envelope) == bodies
+
+
+def test_pack_envelopes_keeps_every_envelope_under_the_size_limit():
+    bodies = [json.dumps({"message": f"{i} " + "x" * (i % 97), "level": "INFO"}) for i in range(5000)]
+
+    groups = pack_envelopes(bodies, max_size=4096)
+
+    assert len(groups) > 1
+    assert [body for group in groups for body in group] == bodies
+    assert all(len(encode_envelope(group)) <= 4096 for group in groups)
+
+
+def test_decode_envelope_rejects_unknown_versions_and_corrupt_payloads():
+    with pytest.raises(InvalidEnvelopeError):
+        decode_envelope("FLQ/9 ndjson+gzip\nAAAA")
+    with pytest.raises(InvalidEnvelopeError):
+        decode_envelope("FLQ/1 ndjson+gzip\nnot base64!")
+
+
+def test_envelope_event_id_is_stable():
+    assert envelope_event_id("message-id", 3) == "message-id:3"
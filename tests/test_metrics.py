@@ -0,0 +1,90 @@
+import json
+import threading
+from http import HTTPStatus
+
+import pytest
+
+from shared.metrics import Metrics, emit_emf, metrics
+
+pytestmark = pytest.mark.anyio
+
+
+def test_metrics_renders_prometheus_counters_and_histograms():
+    registry = Metrics()
+    registry.incr("worker.records_inserted", 3)
+    registry.gauge("worker.sub_batch_size", 120)
+    registry.observe("worker.insert_ms", 4)
+    registry.observe("worker.insert_ms", 40)
+
+    output = registry.to_prometheus("flq")
+
+    assert "# TYPE flq_worker_records_inserted_total counter\nflq_worker_records_inserted_total 3.0" in output
+    assert "# TYPE flq_worker_sub_batch_size gauge\nflq_worker_sub_batch_size 120" in output
+    assert 'flq_worker_insert_ms_bucket{le="2.5"} 0' in output
+    assert 'flq_worker_insert_ms_bucket{le="5"} 1' in output
+    assert 'flq_worker_insert_ms_bucket{le="50"} 2' in output
+    assert 'flq_worker_insert_ms_bucket{le="+Inf"} 2' in output
+    assert "flq_worker_insert_ms_sum 44.0" in output
+    assert "flq_worker_insert_ms_count 2" in output
+
+
+def test_metrics_renders_prometheus_while_other_threads_record():
+    registry = Metrics()
+    stop = threading.Event()
+
+    def record():
+        index = 0
+        while not stop.is_set():
+            index += 1
+            registry.incr(f"counter_{index}")
+            registry.observe(f"timing_{index}", 1)
+
+    recorder = threading.Thread(target=record)
+    recorder.start()
+    try:
+        for _ in range(200):
+            registry.to_prometheus("flq")
+    finally:
+        stop.set()
+        recorder.join()
+
+
+def test_emit_emf_prints_a_document_and_resets(capsys):
+    registry = Metrics()
+    registry.incr("worker.records_inserted", 2)
+    registry.observe("worker.insert_ms", 5)
+
+    emit_emf(registry, "worker")
+
+    document = json.loads(capsys.readouterr().out)
+    definition = document["_aws"]["CloudWatchMetrics"][0]
+    assert definition["Dimensions"] == [["Service"]]
+    assert {"Name": "worker.insert_ms", "Unit": "Milliseconds"} in definition["Metrics"]
+    assert document["Service"] == "worker"
+    assert document["worker.records_inserted"] == 2
+    assert document["worker.insert_ms"] == [5]
+    assert registry.snapshot() == {"counters": {}, "gauges": {}, "timings": {}}
+
+
+def test_disabled_metrics_record_nothing(capsys):
+    registry = Metrics(enabled=False)
+    registry.incr("worker.records_inserted")
+    with registry.timer("worker.insert_ms"):
+        pass
+
+    emit_emf(registry, "worker")
+
+    assert registry.snapshot() == {"counters": {}, "gauges": {}, "timings": {}}
+    assert capsys.readouterr().out == ""
+
+
+async def test_metrics_endpoint_exposes_request_metrics(async_client):
+    metrics.reset()
+    await async_client.post(async_client._transport.app.url_path_for("logs"), json={"message": "m", "level": "NOPE"})
+
+    resp = await async_client.get("/metrics")
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "fastlogqueue_api_requests_invalid_total 1.0" in resp.text
+    assert "fastlogqueue_api_request_ms_count 1" in resp.text
@@ -0,0 +1,93 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from shared.models.partitions import (
+    create_partitions,
+    drop_expired_partitions,
+    ensure_partitions,
+    list_partitions,
+    partition_start,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def test_partition_start_aligns_weeks_on_monday():
+    assert partition_start(date(2024, 6, 6), "week") == date(2024, 6, 3)
+    assert partition_start(date(2024, 6, 6), "day") == date(2024, 6, 6)
+
+
+async def test_ensure_partitions_creates_upcoming_days(async_db):
+    created = await async_db.run_sync(lambda session: ensure_partitions(session.connection(), date(2024, 6, 1), 2))
+    created_again = await async_db.run_sync(
+        lambda session: ensure_partitions(session.connection(), date(2024, 6, 1), 2)
+    )
+
+    assert created == ["log_entries_p20240601", "log_entries_p20240602", "log_entries_p20240603"]
+    assert created_again == []
+
+
+async def test_drop_expired_partitions_keeps_retention_window(async_db):
+    await async_db.run_sync(
+        lambda session: create_partitions(session.connection(), date(2024, 6, 1), date(2024, 6, 10), "day")
+    )
+    await async_db.execute(
+        text("INSERT INTO log_entries (event_id, message, level, timestamp) VALUES ('old', 'm', 20, :ts)"),
+        {"ts": datetime(2024, 6, 2, 8, 0, tzinfo=timezone.utc)},
+    )
+
+    dropped = await async_db.run_sync(
+        lambda session: drop_expired_partitions(session.connection(), date(2024, 6, 10), retention_days=7)
+    )
+    remaining = await async_db.run_sync(lambda session: list_partitions(session.connection()))
+
+    assert dropped == ["log_entries_p20240601", "log_entries_p20240602"]
+    assert next(iter(remaining)) == "log_entries_p20240603"
+    assert (await async_db.execute(text("SELECT count(*) FROM log_entries"))).scalar() == 0
+    assert (await async_db.execute(text("SELECT version FROM log_entries_version"))).scalar() == 1
+
+
+async def test_create_partitions_moves_rows_out_of_the_default_partition(async_db):
+    await async_db.execute(
+        text("INSERT INTO log_entries (event_id, message, level, timestamp) VALUES ('early', 'm', 20, :ts)"),
+        {"ts": datetime(2024, 6, 2, 8, 0, tzinfo=timezone.utc)},
+    )
+
+    created = await async_db.run_sync(
+        lambda session: create_partitions(session.connection(), date(2024, 6, 1), date(2024, 6, 3), "day")
+    )
+    stored_in = await async_db.execute(text("SELECT tableoid::regclass::text FROM log_entries"))
+
+    assert created == ["log_entries_p20240601", "log_entries_p20240602", "log_entries_p20240603"]
+    assert stored_in.scalars().all() == ["log_entries_p20240602"]
+    assert (await async_db.execute(text("SELECT to_regclass('log_entries_default')::text"))).scalar() is not None
+
+
+async def test_drop_expired_partitions_deletes_expired_rows_of_the_default_partition(async_db):
+    await async_db.execute(
+        text(
+            "INSERT INTO log_entries (event_id, message, level, timestamp) VALUES ('old', 'm', 20, :old), ('new', 'm', 20, :new)"
+        ),
+        {"old": datetime(2024, 5, 1, tzinfo=timezone.utc), "new": datetime(2024, 6, 9, tzinfo=timezone.utc)},
+    )
+
+    await async_db.run_sync(
+        lambda session: drop_expired_partitions(session.connection(), date(2024, 6, 10), retention_days=7)
+    )
+
+    assert (await async_db.execute(text("SELECT event_id FROM log_entries"))).scalars().all() == ["new"]
+
+
+async def test_drop_expired_partitions_deletes_expired_rollups(async_db):
+    await async_db.execute(
+        text("INSERT INTO log_entry_rollups (bucket, level, count) VALUES (:old, 20, 1), (:new, 20, 2)"),
+        {"old": datetime(2024, 6, 2, 23, 59, tzinfo=timezone.utc), "new": datetime(2024, 6, 3, tzinfo=timezone.utc)},
+    )
+
+    await async_db.run_sync(
+        lambda session: drop_expired_partitions(session.connection(), date(2024, 6, 10), retention_days=7)
+    )
+
+    assert (await async_db.execute(text("SELECT count FROM log_entry_rollups"))).scalars().all() == [2]
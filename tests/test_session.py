@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from shared.config import settings
+from shared.metrics import metrics
+from shared.models.session import LazyAsyncSessionmaker, acquire_connection, create_engine
+
+pytestmark = pytest.mark.anyio
+
+
+def test_create_engine_applies_pool_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 3)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 2)
+    monkeypatch.setattr(settings, "DB_POOL_RECYCLE", 120)
+
+    engine = create_engine()
+
+    assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 2
+    assert engine.pool._recycle == 120
+    assert engine.pool._pre_ping is True
+
+
+def test_create_engine_without_pool(monkeypatch):
+    monkeypatch.setattr(settings, "DB_USE_NULL_POOL", True)
+
+    engine = create_engine()
+
+    assert isinstance(engine.pool, NullPool)
+
+
+def test_session_factory_creates_the_engine_for_the_first_session(monkeypatch):
+    engine = create_engine()
+    monkeypatch.setattr("shared.models.session.get_engine", lambda: engine)
+    session_factory = LazyAsyncSessionmaker()
+
+    assert session_factory.kw["bind"] is None
+    assert session_factory().bind is engine
+    assert session_factory.kw["bind"] is engine
+
+
+async def test_acquire_connection_records_acquire_time(async_db):
+    metrics.reset()
+
+    await acquire_connection(async_db)
+
+    assert metrics.snapshot()["timings"]["db.connection_acquire_ms"]["count"] == 1
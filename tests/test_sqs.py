@@ -0,0 +1,31 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from shared.sqs import AsyncSQSClient
+
+pytestmark = pytest.mark.anyio
+
+
+class SlowSQS:
+    def __init__(self):
+        self.threads = set()
+
+    def send_message(self, **kwargs):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.05)
+        return {"MessageId": kwargs["MessageBody"]}
+
+
+async def test_async_sqs_client_keeps_requests_in_flight_concurrently():
+    client = AsyncSQSClient(client=SlowSQS(), max_connections=10)
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(client.send_message(QueueUrl="", MessageBody=str(i)) for i in range(10)))
+    elapsed = time.perf_counter() - started
+
+    assert [response["MessageId"] for response in responses] == [str(i) for i in range(10)]
+    assert elapsed < 0.05 * 5
+    assert threading.main_thread().name not in client._client.threads
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+from api.sqs_batcher import SQSMessageBatcher
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingSQS:
+    def __init__(self, failed_ids=()):
+        self.batches = []
+        self.failed_ids = set(failed_ids)
+
+    async def send_message_batch(self, QueueUrl, Entries):
+        self.batches.append([entry["MessageBody"] for entry in Entries])
+        return {
+            "Successful": [{"Id": entry["Id"]} for entry in Entries if entry["Id"] not in self.failed_ids],
+            "Failed": [
+                {"Id": entry["Id"], "SenderFault": False, "Code": "InternalError", "Message": "Test error"}
+                for entry in Entries
+                if entry["Id"] in self.failed_ids
+            ],
+        }
+
+
+async def test_batcher_flushes_when_batch_is_full():
+    sqs = RecordingSQS()
+    batcher = SQSMessageBatcher(sqs, max_batch_size=10, linger=60)
+
+    await asyncio.gather(*(batcher.send(str(i)) for i in range(20)))
+
+    assert sqs.batches == [[str(i) for i in range(10)], [str(i) for i in range(10, 20)]]
+
+
+async def test_batcher_flushes_partial_batch_after_linger():
+    sqs = RecordingSQS()
+    batcher = SQSMessageBatcher(sqs, max_batch_size=10, linger=0.01)
+
+    await asyncio.gather(*(batcher.send(str(i)) for i in range(3)))
+
+    assert sqs.batches == [["0", "1", "2"]]
+
+
+async def test_batcher_fails_only_the_rejected_entry():
+    sqs = RecordingSQS(failed_ids={"1"})
+    batcher = SQSMessageBatcher(sqs, max_batch_size=3, linger=60)
+
+    results = await asyncio.gather(*(batcher.send(str(i)) for i in range(3)), return_exceptions=True)
+
+    assert results[0] == {"Id": "0"}
+    assert isinstance(results[1], ClientError)
+    assert results[2] == {"Id": "2"}
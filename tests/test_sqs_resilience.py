@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+from api.sqs_resilience import BreakerState, CircuitBreaker, CircuitOpenError, ResilientSQSClient, send_deadline
+from shared.metrics import metrics
+from shared.sqs import AsyncSQSClient
+
+pytestmark = pytest.mark.anyio
+
+
+class FaultySQS:
+    """boto3-like SQS stand-in failing its calls with the error codes of `faults`, in order."""
+
+    def __init__(self, faults=(), failed_entries=()):
+        self.faults = list(faults)
+        self.failed_entries = list(failed_entries)
+        self.calls = []
+
+    def _inject_fault(self, operation):
+        code = self.faults.pop(0) if self.faults else None
+        if code is not None:
+            status = 400 if code == "InvalidParameterValue" else 503
+            error = {"Error": {"Code": code, "Message": "Injected"}, "ResponseMetadata": {"HTTPStatusCode": status}}
+            raise ClientError(error, operation)  # pyright: ignore
+
+    def send_message(self, **kwargs):
+        self.calls.append(kwargs["MessageBody"])
+        self._inject_fault("SendMessage")
+        return {"MessageId": kwargs["MessageBody"]}
+
+    def send_message_batch(self, **kwargs):
+        self.calls.append([entry["Id"] for entry in kwargs["Entries"]])
+        self._inject_fault("SendMessageBatch")
+        failed = self.failed_entries.pop(0) if self.failed_entries else {}
+        return {
+            "Successful": [{"Id": entry["Id"]} for entry in kwargs["Entries"] if entry["Id"] not in failed],
+            "Failed": [
+                {"Id": entry["Id"], "SenderFault": code == "InvalidParameterValue", "Code": code, "Message": "Injected"}
+                for entry in kwargs["Entries"]
+                if (code := failed.get(entry["Id"]))
+            ],
+        }
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def resilient_client(faulty_sqs, breaker=None, **kwargs):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    client = ResilientSQSClient(
+        AsyncSQSClient(client=faulty_sqs, max_connections=2),
+        breaker or CircuitBreaker(failure_threshold=10),
+        sleep=sleep,
+        **kwargs,
+    )
+    return client, delays
+
+
+async def test_resilient_client_retries_throttled_sends_with_jittered_backoff():
+    metrics.reset()
+    faulty_sqs = FaultySQS(faults=["ThrottlingException", "ServiceUnavailable", None])
+    client, delays = resilient_client(faulty_sqs, max_attempts=4, base_delay=0.1, max_delay=0.3)
+
+    response = await client.send_message(QueueUrl="", MessageBody="entry")
+
+    assert response == {"MessageId": "entry"}
+    assert faulty_sqs.calls == ["entry"] * 3
+    assert len(delays) == 2
+    assert 0 <= delays[0] <= 0.2 and 0 <= delays[1] <= 0.3
+    assert metrics.counters["api.sqs_retries"] == 2
+
+
+async def test_resilient_client_gives_up_on_client_errors_attempts_and_deadline():
+    faulty_sqs = FaultySQS(faults=["InvalidParameterValue"])
+    client, _ = resilient_client(faulty_sqs)
+    with pytest.raises(ClientError):
+        await client.send_message(QueueUrl="", MessageBody="invalid")
+    assert len(faulty_sqs.calls) == 1
+
+    faulty_sqs = FaultySQS(faults=["ThrottlingException"] * 5)
+    client, _ = resilient_client(faulty_sqs, max_attempts=3)
+    with pytest.raises(ClientError, match="ThrottlingException"):
+        await client.send_message(QueueUrl="", MessageBody="throttled")
+    assert len(faulty_sqs.calls) == 3
+
+    faulty_sqs = FaultySQS(faults=["ThrottlingException"] * 5)
+    client, _ = resilient_client(faulty_sqs, max_attempts=3)
+    with send_deadline(0), pytest.raises(ClientError, match="ThrottlingException"):
+        await client.send_message(QueueUrl="", MessageBody="out of time")
+    assert len(faulty_sqs.calls) == 1
+
+
+async def test_resilient_client_resends_only_retryable_batch_entries():
+    faulty_sqs = FaultySQS(failed_entries=[{"1": "InternalError", "2": "InvalidParameterValue"}, {}])
+    client, _ = resilient_client(faulty_sqs)
+    entries = [{"Id": str(index), "MessageBody": str(index)} for index in range(3)]
+
+    response = await client.send_message_batch(QueueUrl="", Entries=entries)
+
+    assert faulty_sqs.calls == [["0", "1", "2"], ["1"]]
+    assert sorted(item["Id"] for item in response["Successful"]) == ["0", "1"]
+    assert [item["Id"] for item in response["Failed"]] == ["2"]
+
+
+async def test_circuit_breaker_fails_fast_then_probes_sqs():
+    metrics.reset()
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    faulty_sqs = FaultySQS(faults=["ServiceUnavailable"] * 3)
+    client, _ = resilient_client(faulty_sqs, breaker, max_attempts=5)
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await client.send_message(QueueUrl="", MessageBody="outage")
+    assert len(faulty_sqs.calls) == 2
+    assert breaker.state is BreakerState.OPEN
+    assert exc_info.value.retry_after == 10
+    assert metrics.gauges["api.sqs_breaker_state"] == BreakerState.OPEN
+
+    clock.now = 4
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await client.send_message(QueueUrl="", MessageBody="rejected")
+    assert exc_info.value.retry_after == 6
+    assert len(faulty_sqs.calls) == 2
+
+    # The probe fails and opens the breaker again, the next one closes it
+    clock.now = 10
+    with pytest.raises(CircuitOpenError):
+        await client.send_message(QueueUrl="", MessageBody="probe")
+    assert len(faulty_sqs.calls) == 3
+    clock.now = 20
+    assert await client.send_message(QueueUrl="", MessageBody="probe") == {"MessageId": "probe"}
+    assert breaker.state is BreakerState.CLOSED
+    assert metrics.counters["api.sqs_breaker_opened"] == 2
+    assert metrics.counters["api.sqs_breaker_rejected"] == 3
+
+
+async def test_circuit_breaker_releases_the_probe_of_a_cancelled_call():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+
+    class HangingSQS:
+        async def send_message(self, **kwargs):
+            await asyncio.Event().wait()
+
+    client = ResilientSQSClient(HangingSQS(), breaker)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(client.send_message(QueueUrl="", MessageBody="probe"), timeout=0.01)
+
+    assert breaker.state is BreakerState.HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,21 @@
+import pytest
+
+from benchmarks.bench_startup import SCENARIOS, import_profile
+
+# Modules each cold start path must not load, and the most modules it may import in
+# total, about 10% above what it imports today, so new imports are a deliberate choice
+STARTUP_BUDGETS = {
+    "POST /logs": ({"sqlalchemy", "asyncpg", "api.queries", "shared.models"}, 480),
+    "import api.main": ({"sqlalchemy", "asyncpg", "boto3"}, 465),
+    "import worker.main": ({"fastapi", "starlette", "mangum", "boto3", "asyncpg", "http.server"}, 485),
+}
+
+
+@pytest.mark.parametrize("scenario", STARTUP_BUDGETS)
+def test_cold_start_stays_within_import_budget(scenario):
+    forbidden, max_modules = STARTUP_BUDGETS[scenario]
+
+    profile = import_profile(SCENARIOS[scenario])
+
+    assert forbidden.isdisjoint(profile), sorted(forbidden.intersection(profile))
+    assert len(profile) <= max_modules
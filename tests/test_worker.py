@@ -1,27 +1,35 @@
 import json
 import uuid
-from unittest.mock import patch
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import select, text
 
 from shared.models.log_entry import LogEntry
+from worker.adaptive import AdaptiveBatchSize
 
 pytestmark = pytest.mark.anyio
 
 
+def sqs_record(body: str, sent_timestamp: int = 1717243200000) -> dict:
+    return {"messageId": str(uuid.uuid4()), "body": body, "attributes": {"SentTimestamp": str(sent_timestamp)}}
+
+
+@pytest.fixture(autouse=True)
+def clear_recent_event_ids():
+    from worker.main import recent_event_ids
+
+    yield
+    recent_event_ids.clear()
+
+
 @pytest.fixture
 def sqs_event():
     return {
         "Records": [
-            {
-                "messageId": str(uuid.uuid4()),
-                "body": json.dumps({"message": "Test log entry 1", "level": "INFO"}),
-            },
-            {
-                "messageId": str(uuid.uuid4()),
-                "body": json.dumps({"message": "Test log entry 2", "level": "WARNING"}),
-            },
+            sqs_record(json.dumps({"message": "Test log entry 1", "level": "INFO"})),
+            sqs_record(json.dumps({"message": "Test log entry 2", "level": "WARNING"}), 1717243200500),
         ]
     }
 
@@ -30,7 +38,9 @@ async def test_sqs_event_processor(async_db, sqs_event):
     from worker.main import handle_event
 
     with patch("worker.main.AsyncSessionLocal", return_value=async_db):
-        await handle_event(sqs_event)
+        response = await handle_event(sqs_event)
+
+    assert response == {"batchItemFailures": []}
 
     entries = (await async_db.execute(select(LogEntry))).scalars().all()
     assert len(entries) == 2
@@ -40,3 +50,207 @@ async def test_sqs_event_processor(async_db, sqs_event):
 
     assert entries[1].message == "Test log entry 2"
     assert entries[1].level == "WARNING"
+
+    # Stored with the time SQS accepted the message, identical on every redelivery
+    assert entries[0].timestamp == datetime(2024, 6, 1, 12, 0, 0, tzinfo=timezone.utc)
+    assert entries[1].timestamp == datetime(2024, 6, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+
+    # Levels are stored as their numeric logging level
+    stored_levels = (await async_db.execute(text("SELECT level FROM log_entries ORDER BY id"))).scalars().all()
+    assert stored_levels == [20, 30]
+
+
+async def test_sqs_event_processor_skips_already_stored_events(async_db, sqs_event):
+    from worker.main import handle_event
+
+    with patch("worker.main.AsyncSessionLocal", return_value=async_db):
+        await handle_event(sqs_event)
+        await handle_event(sqs_event)
+
+    entries = (await async_db.execute(select(LogEntry))).scalars().all()
+    assert len(entries) == 2
+    assert {entry.event_id for entry in entries} == {record["messageId"] for record in sqs_event["Records"]}
+
+
+async def test_sqs_event_processor_counts_inserted_entries_in_rollups(async_db, sqs_event):
+    from worker.main import handle_event, recent_event_ids
+
+    with patch("worker.main.AsyncSessionLocal", return_value=async_db):
+        await handle_event(sqs_event)
+        recent_event_ids.clear()
+        await handle_event(sqs_event)
+
+    rollups = (await async_db.execute(text("SELECT bucket, level, count FROM log_entry_rollups ORDER BY level"))).all()
+    minute = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+    assert rollups == [(minute, 20, 1), (minute, 30, 1)]
+
+
+async def test_sqs_event_processor_bumps_version_when_entries_are_stored(async_db, sqs_event):
+    from worker.main import handle_event, recent_event_ids
+
+    with patch("worker.main.AsyncSessionLocal", return_value=async_db):
+        await handle_event(sqs_event)
+        recent_event_ids.clear()
+        await handle_event(sqs_event)
+
+    assert (await async_db.execute(text("SELECT version FROM log_entries_version"))).scalar() == 1
+
+
+async def test_sqs_event_processor_skips_recently_committed_events_without_database(async_db, sqs_event):
+    from shared.metrics import metrics
+    from worker.main import handle_event, process_log_entries
+
+    metrics.reset()
+    with (
+        patch("worker.main.AsyncSessionLocal", return_value=async_db),
+        patch("worker.main.process_log_entries", wraps=process_log_entries) as process,
+    ):
+        await handle_event(sqs_event)
+        await handle_event(sqs_event)
+
+    assert [len(call.args[1]) for call in process.call_args_list] == [2, 0]
+    assert metrics.counters["worker.dedupe_cache_hits"] == 2
+    assert metrics.counters["worker.dedupe_cache_misses"] == 2
+
+
+async def test_sqs_event_processor_does_not_cache_rolled_back_events(sqs_event):
+    from worker.main import handle_event, recent_event_ids
+
+    session = AsyncMock()
+    session.commit.side_effect = [Exception("Test error"), None]
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__.return_value = session
+
+    with patch("worker.main.AsyncSessionLocal", session_factory), patch("worker.main.process_log_entries"):
+        response = await handle_event(sqs_event)
+
+    assert len(response["batchItemFailures"]) == 2
+    assert len(recent_event_ids) == 0
+
+
+async def test_sqs_event_processor_copy_write_mode(async_db, sqs_event, monkeypatch):
+    from shared.config import settings
+    from worker.main import handle_event
+
+    monkeypatch.setattr(settings, "WORKER_WRITE_MODE", "copy")
+    sqs_event["Records"].append(sqs_event["Records"][0])
+
+    with patch("worker.main.AsyncSessionLocal", return_value=async_db):
+        await handle_event(sqs_event)
+
+    entries = (await async_db.execute(select(LogEntry))).scalars().all()
+    assert len(entries) == 2
+
+
+@pytest.mark.parametrize("write_mode", ["insert", "copy"])
+async def test_sqs_event_processor_stores_attributes(async_db, monkeypatch, write_mode):
+    from shared.config import settings
+    from worker.main import handle_event
+
+    monkeypatch.setattr(settings, "WORKER_WRITE_MODE", write_mode)
+    attributes = {"service": "checkout", "status": 500, "retry": True}
+    event = {
+        "Records": [
+            sqs_record(json.dumps({"message": "With attributes", "level": "ERROR", "attributes": attributes})),
+            sqs_record(json.dumps({"message": "Empty attributes", "level": "INFO", "attributes": {}}), 1717243200100),
+            sqs_record(json.dumps({"message": "No attributes", "level": "INFO"}), 1717243200200),
+        ]
+    }
+
+    with patch("worker.main.AsyncSessionLocal", return_value=async_db):
+        await handle_event(event)
+
+    entries = (await async_db.execute(select(LogEntry).order_by(LogEntry.timestamp))).scalars().all()
+    assert [entry.attributes for entry in entries] == [attributes, None, None]
+
+
+async def test_sqs_event_processor_reports_only_failed_sub_batches(sqs_event):
+    from worker.main import handle_event
+
+    session = AsyncMock()
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__.return_value = session
+
+    with (
+        patch("worker.main.AsyncSessionLocal", session_factory),
+        patch("worker.main.sub_batch_size", AdaptiveBatchSize(initial=1, floor=1, ceiling=1, target_ms=1000)),
+        patch("worker.main.process_log_entries", side_effect=[1, Exception("Test error")]),
+    ):
+        response = await handle_event(sqs_event)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": sqs_event["Records"][1]["messageId"]}]}
+    session.rollback.assert_awaited_once()
+
+
+async def test_sqs_event_processor_grows_sub_batches_only_on_full_writes(async_db, sqs_event):
+    from worker.main import handle_event
+
+    sqs_event["Records"].insert(1, sqs_record("not json"))
+    sub_batch_size = AdaptiveBatchSize(initial=2, floor=1, ceiling=100, target_ms=1000)
+
+    with (
+        patch("worker.main.AsyncSessionLocal", return_value=async_db),
+        patch("worker.main.sub_batch_size", sub_batch_size),
+    ):
+        await handle_event(sqs_event)
+
+    # Neither the sub-batch holding the invalid record nor the tail wrote 2 records
+    assert sub_batch_size.size == 2
+
+
+async def test_sqs_event_processor_writes_sub_batches_concurrently(sqs_event, monkeypatch):
+    import asyncio
+
+    from shared.config import settings
+    from worker.main import handle_event
+
+    monkeypatch.setattr(settings, "WORKER_WRITE_CONCURRENCY", 2)
+    sessions = [AsyncMock(), AsyncMock()]
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__.side_effect = sessions
+    # Only returns once both sub-batches are being written at the same time
+    both_in_flight = asyncio.Barrier(2)
+
+    async def process_log_entries(session, records):
+        await both_in_flight.wait()
+        return len(records)
+
+    with (
+        patch("worker.main.AsyncSessionLocal", session_factory),
+        patch("worker.main.sub_batch_size", AdaptiveBatchSize(initial=1, floor=1, ceiling=1, target_ms=1000)),
+        patch("worker.main.process_log_entries", process_log_entries),
+    ):
+        response = await asyncio.wait_for(handle_event(sqs_event), timeout=5)
+
+    assert response == {"batchItemFailures": []}
+    assert all(session.commit.await_count == 2 for session in sessions)
+
+
+async def test_sqs_event_processor_drops_invalid_records(async_db, sqs_event):
+    from worker.main import handle_event
+
+    sqs_event["Records"].append(sqs_record(json.dumps({"message": "No level"})))
+
+    with patch("worker.main.AsyncSessionLocal", return_value=async_db):
+        response = await handle_event(sqs_event)
+
+    assert response == {"batchItemFailures": []}
+    entries = (await async_db.execute(select(LogEntry))).scalars().all()
+    assert len(entries) == 2
+
+
+async def test_sqs_event_processor_unpacks_envelopes(async_db):
+    from shared.envelope import encode_envelope
+    from worker.main import handle_event
+
+    bodies = [json.dumps({"message": f"Test log entry {i}", "level": "INFO"}) for i in range(3)]
+    event = {"Records": [sqs_record(encode_envelope(bodies))]}
+    message_id = event["Records"][0]["messageId"]
+
+    with patch("worker.main.AsyncSessionLocal", return_value=async_db):
+        await handle_event(event)
+        await handle_event(event)
+
+    entries = (await async_db.execute(select(LogEntry).order_by(LogEntry.event_id))).scalars().all()
+    assert [entry.event_id for entry in entries] == [f"{message_id}:{i}" for i in range(3)]
+    assert [entry.message for entry in entries] == [f"Test log entry {i}" for i in range(3)]
@@ -0,0 +1,45 @@
+class AdaptiveBatchSize:
+    """
+    Additive increase, multiplicative decrease (AIMD) controller of the sub-batch size.
+
+    After each sub-batch, the size grows by `increase` records when a full sub-batch was
+    committed within `target_ms`, and is multiplied by `decrease` when a sub-batch took
+    longer, typically waiting on locks or a busy database, or failed. The size stays
+    within [floor, ceiling].
+
+    Sub-batches written concurrently may report a slowdown after the size was already
+    reduced for it. Those cut at a larger size than the current one are ignored, so a
+    single spike shrinks the size once instead of once per sub-batch in flight.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        floor: int,
+        ceiling: int,
+        target_ms: float,
+        increase: int = 10,
+        decrease: float = 0.5,
+    ):
+        self.floor = floor
+        self.ceiling = max(ceiling, floor)
+        self.target_ms = target_ms
+        self.increase = increase
+        self.decrease = decrease
+        self.size = self._clamp(initial)
+
+    def _clamp(self, size: float) -> int:
+        return max(self.floor, min(self.ceiling, int(size)))
+
+    def update(self, cut_size: int, duration_ms: float, full: bool = True, failed: bool = False) -> int:
+        """
+        Adjust the size after a sub-batch, cut when the size was `cut_size`, took
+        `duration_ms` to write and commit. `full` tells whether it held `cut_size` records
+        rather than the last records of an event. Returns the new size.
+        """
+        if failed or duration_ms > self.target_ms:
+            if cut_size <= self.size:
+                self.size = self._clamp(self.size * self.decrease)
+        elif full:
+            self.size = self._clamp(self.size + self.increase)
+        return self.size
@@ -0,0 +1,208 @@
+"""
+Long-running SQS consumer, for running the worker on containers instead of Lambda.
+
+Receivers long-poll the queue and feed a bounded prefetch queue, from which concurrent
+processors take batches of messages and pass them to `worker.main.handle_event` in the
+shape of a Lambda SQS event. A message is deleted only after its batch is committed;
+messages reported as failed are made visible again after WORKER_RETRY_DELAY_SECONDS.
+Metrics are served in the Prometheus format on WORKER_METRICS_PORT. On SIGTERM or
+SIGINT the receivers stop, the messages already received are processed and the process
+exits. Prefetched messages count against the queue's visibility timeout, so
+keep WORKER_PREFETCH well below what the worker processes within that timeout.
+
+    python -m worker --concurrency 8 --prefetch 200 --batch-size 100
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+from typing import Any
+
+from shared.config import settings
+from shared.metrics import metrics, start_metrics_server
+from shared.sqs import AsyncSQSClient
+from shared.utils import batched
+from worker.main import handle_event
+
+# Largest number of entries a single ReceiveMessage or batch call accepts
+SQS_MAX_BATCH_SIZE = 10
+
+
+def sqs_record(message: dict[str, Any]) -> dict[str, Any]:
+    """Convert a ReceiveMessage result into the record shape of a Lambda SQS event."""
+    return {
+        "messageId": message["MessageId"],
+        "receiptHandle": message["ReceiptHandle"],
+        "body": message["Body"],
+        "attributes": message.get("Attributes", {}),
+    }
+
+
+class SQSConsumer:
+    """Receives messages with `concurrency` long-poll loops and processes them in as many concurrent batches."""
+
+    def __init__(
+        self,
+        sqs: AsyncSQSClient,
+        queue_url: str,
+        concurrency: int = 4,
+        prefetch: int = 100,
+        batch_size: int = 100,
+        wait_time_seconds: int = 20,
+        retry_delay_seconds: int = 10,
+    ):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.wait_time_seconds = wait_time_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+        self._messages: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue(maxsize=prefetch)
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop receiving; `run` returns once the received messages are processed."""
+        logging.info("Stopping SQS consumer")
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Consume the queue until `stop` is called."""
+        receivers = [asyncio.create_task(self._receive()) for _ in range(self.concurrency)]
+        processors = [asyncio.create_task(self._process()) for _ in range(self.concurrency)]
+
+        await self._stopping.wait()
+        # Cancelling a pending long poll is safe: messages it may still return stay
+        # invisible until their visibility timeout expires and are then redelivered.
+        for receiver in receivers:
+            receiver.cancel()
+        await asyncio.gather(*receivers, return_exceptions=True)
+
+        for _ in processors:
+            await self._messages.put(None)
+        await asyncio.gather(*processors)
+
+    async def _receive(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                response = await self.sqs.receive_message(
+                    QueueUrl=self.queue_url,
+                    MaxNumberOfMessages=SQS_MAX_BATCH_SIZE,
+                    WaitTimeSeconds=self.wait_time_seconds,
+                    # The worker derives each entry's timestamp from it, see worker.writer
+                    AttributeNames=["SentTimestamp"],
+                )
+            except Exception as e:
+                logging.error(f"Failed to receive messages: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            messages = response.get("Messages", [])
+            metrics.incr("worker.messages_received", len(messages))
+            for message in messages:
+                await self._messages.put(message)
+
+    async def _process(self) -> None:
+        while True:
+            message = await self._messages.get()
+            if message is None:
+                return
+
+            batch = [message]
+            while len(batch) < self.batch_size and not self._messages.empty():
+                message = self._messages.get_nowait()
+                if message is None:
+                    await self.process_batch(batch)
+                    return
+                batch.append(message)
+            await self.process_batch(batch)
+
+    async def process_batch(self, messages: list[dict[str, Any]]) -> None:
+        """Process messages with `handle_event`, then delete the committed ones and delay the failed ones."""
+        try:
+            with metrics.timer("worker.batch_ms"):
+                response = await handle_event({"Records": [sqs_record(message) for message in messages]})
+            failed_ids = {failure["itemIdentifier"] for failure in response["batchItemFailures"]}
+        except Exception as e:
+            logging.error(f"Failed to process {len(messages)} messages: {e}")
+            failed_ids = {message["MessageId"] for message in messages}
+
+        committed = [message for message in messages if message["MessageId"] not in failed_ids]
+        failed = [message for message in messages if message["MessageId"] in failed_ids]
+
+        for chunk in batched(committed, SQS_MAX_BATCH_SIZE):
+            entries = [
+                {"Id": str(index), "ReceiptHandle": message["ReceiptHandle"]} for index, message in enumerate(chunk)
+            ]
+            await self._settle("delete_message_batch", entries)
+        for chunk in batched(failed, SQS_MAX_BATCH_SIZE):
+            entries = [
+                {
+                    "Id": str(index),
+                    "ReceiptHandle": message["ReceiptHandle"],
+                    "VisibilityTimeout": self.retry_delay_seconds,
+                }
+                for index, message in enumerate(chunk)
+            ]
+            await self._settle("change_message_visibility_batch", entries)
+
+        metrics.incr("worker.messages_deleted", len(committed))
+        metrics.incr("worker.messages_retried", len(failed))
+
+    async def _settle(self, operation: str, entries: list[dict[str, Any]]) -> None:
+        """Run a batch delete or visibility change, logging the entries SQS could not apply."""
+        try:
+            response = await getattr(self.sqs, operation)(QueueUrl=self.queue_url, Entries=entries)
+        except Exception as e:
+            logging.error(f"{operation} failed for {len(entries)} messages: {e}")
+            return
+        for failure in response.get("Failed", []):
+            logging.error(f"{operation} failed for entry {failure['Id']}: {failure.get('Message')}")
+
+
+def size_connection_pool(concurrency: int) -> None:
+    """
+    Grow DB_POOL_SIZE to the connections `concurrency` batches may hold at once.
+
+    Every batch writes over up to WORKER_WRITE_CONCURRENCY connections; a smaller pool
+    would leave writers waiting on each other for up to DB_POOL_TIMEOUT. Must be called
+    before the engine is created, which happens on the first session.
+    """
+    connections = concurrency * settings.WORKER_WRITE_CONCURRENCY
+    if not settings.DB_USE_NULL_POOL and settings.DB_POOL_SIZE < connections:
+        logging.info(f"Growing the connection pool from {settings.DB_POOL_SIZE} to {connections} connections")
+        settings.DB_POOL_SIZE = connections
+
+
+async def consume(consumer: SQSConsumer) -> None:
+    """Run `consumer` until the process receives SIGTERM or SIGINT."""
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, consumer.stop)
+    await consumer.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    parser.add_argument("--prefetch", type=int, default=settings.WORKER_PREFETCH)
+    parser.add_argument("--batch-size", type=int, default=settings.WORKER_BATCH_SIZE)
+    parser.add_argument("--metrics-port", type=int, default=settings.WORKER_METRICS_PORT)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+    size_connection_pool(args.concurrency)
+
+    if metrics.enabled and args.metrics_port:
+        start_metrics_server(metrics, args.metrics_port, settings.METRICS_PREFIX)
+
+    consumer = SQSConsumer(
+        # Every receiver holds a connection for the duration of its long poll
+        AsyncSQSClient(max_connections=2 * args.concurrency),
+        settings.QUEUE_URL,
+        concurrency=args.concurrency,
+        prefetch=args.prefetch,
+        batch_size=args.batch_size,
+        wait_time_seconds=settings.WORKER_WAIT_TIME_SECONDS,
+        retry_delay_seconds=settings.WORKER_RETRY_DELAY_SECONDS,
+    )
+    asyncio.run(consume(consumer))
@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+
+class RecentEventIds:
+    """
+    Bounded, in-process set of event IDs known to be stored in the database.
+
+    IDs are evicted least recently seen first once `max_size` is reached, and expire
+    `ttl` seconds after they were added. A cached ID is never wrong, so callers may skip
+    it without asking the database; an evicted one merely costs a round trip where the
+    unique constraint rejects it. A `max_size` of 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int = 50_000, ttl: float = 900.0, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._expires_at: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._expires_at)
+
+    def __contains__(self, event_id: str) -> bool:
+        expires_at = self._expires_at.get(event_id)
+        if expires_at is None:
+            return False
+        if expires_at <= self._clock():
+            del self._expires_at[event_id]
+            return False
+        self._expires_at.move_to_end(event_id)
+        return True
+
+    def add_many(self, event_ids: Iterable[str]) -> None:
+        """Remember event IDs whose rows have been committed."""
+        if self.max_size <= 0:
+            return
+        expires_at = self._clock() + self.ttl
+        for event_id in event_ids:
+            self._expires_at[event_id] = expires_at
+            self._expires_at.move_to_end(event_id)
+        while len(self._expires_at) > self.max_size:
+            self._expires_at.popitem(last=False)
+
+    def clear(self) -> None:
+        self._expires_at.clear()
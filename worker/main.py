@@ -1,94 +1,239 @@
 import asyncio
-import json
 import logging
-from itertools import islice
-from typing import Any
+import math
+import time
+from typing import Any, Iterator
 
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.models.log_entry import LogEntry
-from shared.models.session import AsyncSessionLocal
+from shared.codec import codec, decode_log_entries
+from shared.config import settings
+from shared.envelope import InvalidEnvelopeError, decode_envelope, envelope_event_id, is_envelope
+from shared.metrics import emit_emf, metrics
+from shared.models.session import AsyncSessionLocal, acquire_connection
+from worker.adaptive import AdaptiveBatchSize
+from worker.dedupe import RecentEventIds
+from worker.writer import build_rows, bump_version, count_rollups, increment_rollups, write_log_entries
 
 logging.basicConfig(level=logging.DEBUG)
 
-# Set the batch size for bulk insert into Postgres
-# Even if the SQS is modified to send a large number of events, processing the records
-# in smaller batches during the bulk insert helps avoid blocking the database for an
-# extended period. This allows for better concurrency and prevents the database from
-# becoming unresponsive.
+# Initial number of records written per transaction. Records are written in sub-batches
+# so a large event does not hold locks for an extended period; the size then adapts to
+# the observed write latency within WORKER_SUB_BATCH_SIZE_FLOOR and _CEILING.
 BATCH_SIZE = 100
 
-loop = asyncio.get_event_loop()
+# Pooled asyncpg connections are bound to the event loop that opened them, so a single
+# loop is kept for the lifetime of the container and reused by warm invocations.
+loop = asyncio.new_event_loop()
+asyncio.set_event_loop(loop)
 
+# Sub-batch size controller, kept across warm invocations like the cache below
+sub_batch_size = AdaptiveBatchSize(
+    initial=BATCH_SIZE,
+    floor=settings.WORKER_SUB_BATCH_SIZE_FLOOR,
+    ceiling=settings.WORKER_SUB_BATCH_SIZE_CEILING,
+    target_ms=settings.WORKER_SUB_BATCH_TARGET_MS,
+)
 
-def batched(iterable, n):
-    """Batch data into chunks of length n. The last batch may be shorter."""
-    it = iter(iterable)
-    while batch := list(islice(it, n)):
-        yield batch
+# Event IDs committed by this process, so SQS redeliveries of recently processed messages
+# are dropped before they reach the database. Only filled after a successful commit.
+recent_event_ids = RecentEventIds(settings.WORKER_DEDUPE_CACHE_SIZE, settings.WORKER_DEDUPE_CACHE_TTL_SECONDS)
 
 
-def extract_valid_records(records: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], set]:
-    """Extract valid records and event IDs from the given list of records."""
-    valid_records = []
-    event_ids = set()
+def unpack_records(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Expand packed envelopes into one record per log entry.
+
+    Plain records are passed through unchanged. Entries unpacked from an envelope get the
+    stable event ID `<messageId>:<index>` and keep the ID of the SQS message that carried
+    them in `sourceMessageId`, which is what SQS needs to redeliver them.
+    """
+    unpacked = []
     for record in records:
+        body = record.get("body", "")
+        if not is_envelope(body):
+            unpacked.append(record)
+            continue
+
         try:
-            body = json.loads(record["body"])
-            body["id"] = record["messageId"]
-            valid_records.append(body)
-            event_ids.add(record["messageId"])
-        except (json.JSONDecodeError, KeyError) as e:
-            logging.error(f"Invalid message format: {record['body']}. Error: {str(e)}")
-    return valid_records, event_ids
+            entry_bodies = decode_envelope(body)
+        except InvalidEnvelopeError as e:
+            logging.error(f"Invalid envelope in message {record['messageId']}. Error: {str(e)}")
+            continue
+
+        unpacked.extend(
+            {
+                **record,
+                "messageId": envelope_event_id(record["messageId"], index),
+                "body": entry_body,
+                "sourceMessageId": record["messageId"],
+            }
+            for index, entry_body in enumerate(entry_bodies)
+        )
+    return unpacked
 
 
-async def process_log_entries(session: AsyncSession, records: list[dict[str, Any]], event_ids: set) -> list[LogEntry]:
+def skip_recent_records(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Drop the records whose event ID was committed recently by this process."""
+    new_records = [record for record in records if record["id"] not in recent_event_ids]
+    metrics.incr("worker.dedupe_cache_hits", len(records) - len(new_records))
+    metrics.incr("worker.dedupe_cache_misses", len(new_records))
+    return new_records
+
+
+def extract_valid_records(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
     """
-    Process log entries from the given records and event IDs.
+    Extract valid records from the given list of records.
 
-    This function checks for existing event IDs in the database and creates
-    LogEntry objects for new records.
+    All bodies are decoded and validated against the log entry schema in one pass;
+    records that fail are logged and split out before anything reaches the database.
+    """
+    with metrics.timer("worker.decode_ms"):
+        entries, errors = decode_log_entries([record.get("body", "") for record in records])
+    metrics.incr("worker.records_invalid", len(errors))
+    for index, error in errors:
+        logging.error(f"Invalid message format: {records[index].get('body')}. Error: {error}")
+
+    return [
+        {
+            "id": records[index]["messageId"],
+            "message_id": records[index].get("sourceMessageId", records[index]["messageId"]),
+            "sent_timestamp": records[index].get("attributes", {}).get("SentTimestamp"),
+            **entry,
+        }
+        for index, entry in entries
+    ]
+
+
+async def process_log_entries(session: AsyncSession, records: list[dict[str, Any]]) -> int:
     """
-    existing_event_ids_result = await session.execute(select(LogEntry.event_id).where(LogEntry.event_id.in_(event_ids)))
-    existing_event_ids = {row[0] for row in existing_event_ids_result}
+    Process log entries from the given records.
 
-    entities = []
-    for record in records:
-        if record["id"] in existing_event_ids:
-            continue
-        log_entry = LogEntry(event_id=record["id"], message=record["message"], level=record["level"])
-        entities.append(log_entry)
+    The records are written in a single statement that skips event IDs already
+    stored in the database, then the inserted rows are added to the per-minute rollups
+    and the version of the log entries is bumped in the same transaction. Returns the
+    number of inserted rows.
+    """
+    rows = build_rows(records)
+    with metrics.timer("worker.insert_ms"):
+        inserted_event_ids = await write_log_entries(session, rows)
+    with metrics.timer("worker.rollup_ms"):
+        await increment_rollups(session, count_rollups(rows, inserted_event_ids))
+        if inserted_event_ids:
+            await bump_version(session)
+    metrics.incr("worker.records_inserted", len(inserted_event_ids))
+    metrics.incr("worker.records_duplicate", len(records) - len(inserted_event_ids))
+
+    logging.debug(
+        f"Processed {len(records)} log entries: {len(inserted_event_ids)} inserted, "
+        f"{len(records) - len(inserted_event_ids)} skipped as duplicates."
+    )
+    return len(inserted_event_ids)
+
+
+def cut_sub_batches(records: list[dict[str, Any]]) -> Iterator[tuple[int, list[dict[str, Any]]]]:
+    """Yield the records in sub-batches of the current size, along with that size."""
+    start = 0
+    while start < len(records):
+        size = sub_batch_size.size
+        yield size, records[start : start + size]
+        start += size
+
+
+async def write_sub_batch(session: AsyncSession, records: list[dict[str, Any]]) -> list[str]:
+    """
+    Write and commit one sub-batch of valid records.
 
-    logging.debug(f"Processed {len(entities)} new log entries.")
-    return entities
+    Returns the message IDs of the records when the sub-batch could not be committed,
+    after rolling it back, so that only those messages are redelivered.
+    """
+    with metrics.timer("worker.sub_batch_ms"):
+        try:
+            await process_log_entries(session, records)
+            with metrics.timer("worker.commit_ms"):
+                await session.commit()
+        except Exception as e:
+            logging.error(f"Unexpected error: {e}")
+            await session.rollback()
+            metrics.incr("worker.records_failed", len(records))
+            return [record["message_id"] for record in records]
 
+    recent_event_ids.add_many(record["id"] for record in records)
+    return []
 
-async def handle_event(event: dict) -> None:
-    """Handle the incoming AWS SQS event."""
-    logging.debug("Function triggered with payload")
-    logging.debug(f"Event payload: {json.dumps(event)}")
 
-    records = event.get("Records", [])
-    async with AsyncSessionLocal() as session:
-        for record_batch in batched(records, BATCH_SIZE):
-            valid_records, event_ids = extract_valid_records(record_batch)
-
-            try:
-                entries = await process_log_entries(session, valid_records, event_ids)
-                if entries:
-                    session.add_all(entries)
-                    await session.commit()
-            except Exception as e:
-                logging.error(f"Unexpected error: {e}")
-                await session.rollback()
+async def write_sub_batches(sub_batches: asyncio.Queue) -> list[str]:
+    """
+    Write the sub-batches taken from `sub_batches` over one connection until a None arrives.
 
+    Each item is the sub-batch size when it was cut, whether it held that many valid
+    records, and those records; the write latency of every sub-batch is fed back to `sub_batch_size`.
+    Returns the message IDs of the sub-batches that could not be committed.
+    """
+    failed_message_ids = []
+    async with AsyncSessionLocal() as session:
+        await acquire_connection(session)
+        while (sub_batch := await sub_batches.get()) is not None:
+            cut_size, full, records = sub_batch
+            started = time.perf_counter()
+            failed = await write_sub_batch(session, records)
+            size = sub_batch_size.update(cut_size, (time.perf_counter() - started) * 1000, full, bool(failed))
+            metrics.gauge("worker.sub_batch_size", size)
+            failed_message_ids.extend(failed)
         await session.commit()
-
-    logging.debug("Messages processed successfully")
+    return failed_message_ids
 
 
-def lambda_handler(event: dict, context: Any) -> None:
+async def handle_event(event: dict) -> dict[str, list[dict[str, str]]]:
+    """
+    Handle the incoming AWS SQS event.
+
+    Packed envelopes are expanded first, so sub-batches hold individual log entries.
+    Entries committed recently by this process are skipped without a database round trip.
+    Sub-batches, sized by `sub_batch_size`, are decoded here and written by up to
+    WORKER_WRITE_CONCURRENCY writers, each in its own transaction on its own connection,
+    so the next sub-batch is decoded while the previous ones are being written.
+    Returns a partial batch response listing the message IDs of the sub-batches that
+    could not be committed, so SQS only redelivers those messages. Records with an
+    invalid body are logged and dropped, since redelivering them cannot succeed.
+    """
+    logging.debug("Function triggered with payload")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Event payload: {codec.dumps(event)}")
+
+    records = unpack_records(event.get("Records", []))
+    metrics.incr("worker.records_received", len(records))
+    writer_count = max(1, min(settings.WORKER_WRITE_CONCURRENCY, math.ceil(len(records) / sub_batch_size.size)))
+    # Holds at most one decoded sub-batch per writer, which bounds the records in memory
+    sub_batches: asyncio.Queue = asyncio.Queue(maxsize=writer_count)
+
+    try:
+        async with asyncio.TaskGroup() as task_group:
+            writers = [task_group.create_task(write_sub_batches(sub_batches)) for _ in range(writer_count)]
+            for cut_size, record_batch in cut_sub_batches(records):
+                valid_records = skip_recent_records(extract_valid_records(record_batch))
+                full = len(valid_records) == cut_size
+                await sub_batches.put((cut_size, full, valid_records))
+                # Let a writer send the sub-batch before the next one is decoded
+                await asyncio.sleep(0)
+            for _ in writers:
+                await sub_batches.put(None)
+    except ExceptionGroup as group:
+        # A writer could not reach the database: fail the whole event, as without writers
+        raise group.exceptions[0]
+
+    failed_message_ids = list(dict.fromkeys(message_id for writer in writers for message_id in writer.result()))
+    if failed_message_ids:
+        logging.error(f"Failed to process {len(failed_message_ids)} messages")
+    else:
+        logging.debug("Messages processed successfully")
+
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_message_ids]}
+
+
+def lambda_handler(event: dict, context: Any) -> dict[str, list[dict[str, str]]]:
     """AWS Lambda handler function."""
-    return loop.run_until_complete(handle_event(event))
+    with metrics.timer("worker.invocation_ms"):
+        response = loop.run_until_complete(handle_event(event))
+    emit_emf(metrics, "worker")
+    return response
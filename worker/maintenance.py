@@ -0,0 +1,103 @@
+"""
+Database maintenance tasks for the log_entries table.
+
+Partitions are maintained daily by a scheduled Lambda function (`lambda_handler`). All
+tasks can be run by hand:
+
+    python -m worker.maintenance create-partitions [--ahead DAYS]
+    python -m worker.maintenance drop-partitions [--retention-days DAYS]
+    python -m worker.maintenance backfill-rollups [--since YYYY-MM-DD] [--until YYYY-MM-DD]
+"""
+
+import argparse
+import logging
+from datetime import date
+from typing import Any
+
+from sqlalchemy import create_engine
+
+from shared.config import settings
+from shared.models.partitions import drop_expired_partitions, ensure_partitions
+from shared.models.rollups import rebuild_rollups, stored_days
+
+logging.basicConfig(level=logging.INFO)
+
+
+def create_partitions(ahead: int | None = None) -> list[str]:
+    """Create the partitions for today and the next `ahead` days."""
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+    with engine.begin() as connection:
+        return ensure_partitions(connection, ahead=ahead)
+
+
+def drop_partitions(retention_days: int | None = None) -> list[str]:
+    """Drop the partitions older than the retention period."""
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+    with engine.begin() as connection:
+        return drop_expired_partitions(connection, retention_days=retention_days)
+
+
+def backfill_rollups(since: date | None = None, until: date | None = None) -> int:
+    """
+    Rebuild the rollups of the days from `since` up to, but excluding, `until`.
+
+    Defaults to every day holding log entries. Each day is rebuilt in its own transaction,
+    during which the worker waits to update rollups. Returns the number of rollup rows.
+    """
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+    with engine.connect() as connection:
+        days = stored_days(connection)
+
+    written = 0
+    for day in days:
+        if (since is not None and day < since) or (until is not None and day >= until):
+            continue
+        with engine.begin() as connection:
+            written += rebuild_rollups(connection, day)
+        logging.info(f"Rebuilt rollups of {day}")
+    return written
+
+
+def lambda_handler(event: dict, context: Any) -> dict[str, list[str]]:
+    """
+    AWS Lambda handler function for the scheduled partition maintenance.
+
+    Partitions are created and dropped in separate transactions, so that expired
+    partitions are dropped even when creating the upcoming ones fails, and the other way
+    around. The first error is raised once both tasks ran.
+    """
+    result: dict[str, list[str]] = {}
+    errors = []
+    for key, task in (("created", create_partitions), ("dropped", drop_partitions)):
+        try:
+            result[key] = task()
+        except Exception as exc:
+            logging.exception(f"Partition maintenance task {task.__name__} failed")
+            errors.append(exc)
+    if errors:
+        raise errors[0]
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    create_parser = commands.add_parser("create-partitions", help="Create partitions for the coming days")
+    create_parser.add_argument("--ahead", type=int, default=None)
+    drop_parser = commands.add_parser("drop-partitions", help="Drop partitions older than the retention period")
+    drop_parser.add_argument("--retention-days", type=int, default=None)
+    backfill_parser = commands.add_parser("backfill-rollups", help="Rebuild the rollups from the stored log entries")
+    backfill_parser.add_argument("--since", type=date.fromisoformat, default=None)
+    backfill_parser.add_argument("--until", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    if args.command == "create-partitions":
+        print("\n".join(create_partitions(args.ahead)) or "No partitions created")
+    elif args.command == "drop-partitions":
+        print("\n".join(drop_partitions(args.retention_days)) or "No partitions dropped")
+    else:
+        print(f"Wrote {backfill_rollups(args.since, args.until)} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+from sqlalchemy import BigInteger, DateTime, SmallInteger, String, bindparam, cast, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.codec import codec
+from shared.config import settings
+from shared.models.log_entries_version import BUMP_LOG_ENTRIES_VERSION
+from shared.models.log_entry import LOG_LEVELS, LogEntry
+from shared.models.log_rollup import ROLLUP_BUCKET_SECONDS, LogRollup
+
+# Columns written by the bulk insert path, in the order used by the row tuples
+LOG_ENTRY_COLUMNS = ("event_id", "message", "level", "timestamp", "attributes")
+
+# Temporary per-connection table the COPY write mode streams rows into
+STAGING_TABLE = "log_entries_staging"
+
+_rows = (
+    func.unnest(
+        bindparam("event_ids", type_=ARRAY(String)),
+        bindparam("messages", type_=ARRAY(String)),
+        bindparam("levels", type_=ARRAY(SmallInteger)),
+        bindparam("timestamps", type_=ARRAY(DateTime(timezone=True))),
+        # Serialized JSON, cast below, which spares the driver encoding an array of JSONB
+        bindparam("attributes", type_=ARRAY(String)),
+    )
+    .table_valued(*LOG_ENTRY_COLUMNS)
+    .render_derived(name="new_rows")
+)
+
+# A single statement with five array parameters, whatever the batch size, so the
+# prepared statement is reused across batches and duplicates are skipped by the
+# unique index on (event_id, timestamp) instead of a separate lookup.
+INSERT_LOG_ENTRIES = (
+    insert(LogEntry.__table__)
+    .from_select(
+        LOG_ENTRY_COLUMNS,
+        select(*(_rows.c[column] for column in LOG_ENTRY_COLUMNS[:-1]), cast(_rows.c.attributes, JSONB)),
+    )
+    .on_conflict_do_nothing(index_elements=[LogEntry.__table__.c.event_id, LogEntry.__table__.c.timestamp])
+    .returning(LogEntry.__table__.c.event_id)
+)
+
+_rollup_rows = (
+    func.unnest(
+        bindparam("buckets", type_=ARRAY(DateTime(timezone=True))),
+        bindparam("levels", type_=ARRAY(SmallInteger)),
+        bindparam("counts", type_=ARRAY(BigInteger)),
+    )
+    .table_valued("bucket", "level", "count")
+    .render_derived(name="new_counts")
+)
+
+_insert_rollups = insert(LogRollup.__table__).from_select(
+    ["bucket", "level", "count"], select(_rollup_rows.c.bucket, _rollup_rows.c.level, _rollup_rows.c["count"])
+)
+
+# Adds the counts of a batch to the existing rollup rows, creating the missing ones
+INCREMENT_ROLLUPS = _insert_rollups.on_conflict_do_update(
+    index_elements=[LogRollup.__table__.c.bucket, LogRollup.__table__.c.level],
+    set_={"count": LogRollup.__table__.c["count"] + _insert_rollups.excluded["count"]},
+)
+
+CREATE_STAGING_TABLE = text(
+    f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} "
+    f"(LIKE {LogEntry.__tablename__} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+)
+
+MERGE_STAGING_TABLE = text(
+    f"INSERT INTO {LogEntry.__tablename__} ({', '.join(LOG_ENTRY_COLUMNS)}) "
+    f"SELECT {', '.join(LOG_ENTRY_COLUMNS)} FROM {STAGING_TABLE} "
+    "ON CONFLICT (event_id, timestamp) DO NOTHING RETURNING event_id"
+)
+
+
+def record_timestamp(record: dict[str, Any], default: datetime) -> datetime:
+    """
+    Return the timestamp to store for a record: the time SQS accepted its message.
+
+    SentTimestamp is the same on every delivery of a message, which keeps redelivered
+    records in the same partition as the original (see shared.models.partitions).
+    """
+    sent_timestamp = record.get("sent_timestamp")
+    if sent_timestamp is None:
+        return default
+    return datetime.fromtimestamp(int(sent_timestamp) / 1000, tz=timezone.utc)
+
+
+def build_rows(records: list[dict[str, Any]]) -> list[tuple]:
+    """
+    Build `log_entries` row tuples from validated records, without creating ORM instances.
+
+    Levels are converted to their stored SMALLINT value and attributes serialized to JSON
+    here, since the bulk write paths bypass the column types of the model.
+    """
+    now = datetime.now(timezone.utc)
+    return [
+        (
+            record["id"],
+            record["message"],
+            LOG_LEVELS[record["level"]],
+            record_timestamp(record, now),
+            codec.dumps(record["attributes"]) if record.get("attributes") else None,
+        )
+        for record in records
+    ]
+
+
+async def insert_log_entries(session: AsyncSession, rows: list[tuple]) -> list[str]:
+    """
+    Insert rows into `log_entries`, skipping event IDs that are already stored.
+
+    Returns the event IDs of the rows that were actually inserted.
+    """
+    if not rows:
+        return []
+
+    event_ids, messages, levels, timestamps, attributes = (list(column) for column in zip(*rows))
+    result = await session.execute(
+        INSERT_LOG_ENTRIES,
+        {
+            "event_ids": event_ids,
+            "messages": messages,
+            "levels": levels,
+            "timestamps": timestamps,
+            "attributes": attributes,
+        },
+    )
+    return list(result.scalars())
+
+
+async def copy_log_entries(session: AsyncSession, rows: list[tuple]) -> list[str]:
+    """
+    Write rows into `log_entries` through a COPY into a temporary staging table.
+
+    On asyncpg the rows are streamed with the binary COPY protocol and then merged with
+    INSERT ... ON CONFLICT DO NOTHING, which costs more round trips than `insert_log_entries`
+    but less CPU for very large batches. Other drivers fall back to `insert_log_entries`.
+    """
+    if not rows:
+        return []
+
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    if not hasattr(driver_connection, "copy_records_to_table"):
+        return await insert_log_entries(session, rows)
+
+    # Creating the staging table also makes the driver open the session's transaction,
+    # so the COPY below runs inside it.
+    await session.execute(CREATE_STAGING_TABLE)
+    await driver_connection.copy_records_to_table(  # pyright: ignore
+        STAGING_TABLE, records=rows, columns=LOG_ENTRY_COLUMNS
+    )
+    result = await session.execute(MERGE_STAGING_TABLE)
+    return list(result.scalars())
+
+
+async def write_log_entries(session: AsyncSession, rows: list[tuple]) -> list[str]:
+    """Write rows with the configured write mode and return the inserted event IDs."""
+    if settings.WORKER_WRITE_MODE == "copy":
+        return await copy_log_entries(session, rows)
+    return await insert_log_entries(session, rows)
+
+
+def rollup_bucket(timestamp: datetime) -> datetime:
+    """Return the start of the rollup bucket containing `timestamp`."""
+    seconds = int(timestamp.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % ROLLUP_BUCKET_SECONDS, tz=timezone.utc)
+
+
+def count_rollups(rows: list[tuple], inserted_event_ids: Iterable[str]) -> Counter[tuple[datetime, int]]:
+    """Count the inserted rows per (bucket, level), leaving out the rows skipped as duplicates."""
+    inserted = set(inserted_event_ids)
+    return Counter(
+        (rollup_bucket(timestamp), level) for event_id, _, level, timestamp, _ in rows if event_id in inserted
+    )
+
+
+async def increment_rollups(session: AsyncSession, counts: Counter[tuple[datetime, int]]) -> None:
+    """
+    Add `counts` to `log_entry_rollups` in the session's transaction.
+
+    The upsert locks the rollup rows it touches until the transaction ends, so it is the
+    last statement before the commit, and the rows are locked in a fixed order so that
+    concurrent batches wait for each other instead of deadlocking.
+    """
+    if not counts:
+        return
+
+    keys = sorted(counts)
+    await session.execute(
+        INCREMENT_ROLLUPS,
+        {
+            "buckets": [bucket for bucket, _ in keys],
+            "levels": [level for _, level in keys],
+            "counts": [counts[key] for key in keys],
+        },
+    )
+
+
+async def bump_version(session: AsyncSession) -> None:
+    """
+    Bump `log_entries_version` in the session's transaction.
+
+    Every concurrent batch updates the same row, which stays locked until the commit, so
+    it comes after the rollups and batches only wait for each other's commits.
+    """
+    await session.execute(BUMP_LOG_ENTRIES_VERSION)